@@ -0,0 +1,247 @@
+"""Versioned JSON API for venues, artists and shows, served as an ASGI app:
+
+    uvicorn api:app --workers 4
+
+    GET /api/v1/venues[?genre=&state=&city=]
+    GET /api/v1/artists[?genre=&state=]
+    GET /api/v1/shows[?venue_id=&artist_id=&upcoming=1]
+    GET /api/v1/<venues|artists|shows>/<id>
+
+Lists take ?limit= and ?after= (the "next" cursor of the previous page).
+Every route takes ?fields=a,b,c to return only those fields. Responses are
+brotli (when the brotli package is installed) or gzip compressed for
+clients that accept it.
+
+Queries run on SQLAlchemy's asyncio engine (SQLAlchemy 1.4+, with asyncpg
+for postgres or aiosqlite for sqlite), so a worker waits on the database
+and on slow clients without holding a thread per request. The tables and
+settings are the Flask app's (app.py, config.py).
+"""
+import gzip
+import json
+import re
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import app as flask_app, Venue, Artist, Show, Genre, genre_links, names_joined, show_name_columns, join_show_parents
+from bulk import plain
+from pagination import keyset_select, split_page
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+config = flask_app.config
+
+async_drivers = {'postgres': 'postgresql+asyncpg', 'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+
+def async_url(url):
+    scheme, rest = url.split('://', 1)
+    return async_drivers.get(scheme.split('+')[0], scheme) + '://' + rest
+
+
+def engine_options():
+    options = {key: value for key, value in config['SQLALCHEMY_ENGINE_OPTIONS'].items()
+               if key not in ('poolclass', 'connect_args')}
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('postgres'):
+        # this engine only serves requests, so every connection gets the
+        # request statement timeout (see limit_statement_time in app.py)
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(config['DB_STATEMENT_TIMEOUT'])}}
+    return options
+
+
+engine = create_async_engine(async_url(config['SQLALCHEMY_DATABASE_URI']), **engine_options())
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def joined_genres(model):
+    link = genre_links[model]
+    aggregate = func.string_agg if engine.dialect.name == 'postgresql' else func.group_concat
+    return select([aggregate(Genre.name, ',')]).where(and_(
+        link.table.c.genre_id == Genre.id, link == model.id)).scalar_subquery().label('genres')
+
+
+venue_fields = ['id', 'name', 'city', 'state', 'address', 'phone', 'website', 'image_link', 'facebook_link',
+                'seeking_talent', 'seeking_description', 'latitude', 'longitude', 'upcoming_shows_count',
+                'updated_at']
+artist_fields = ['id', 'name', 'city', 'state', 'phone', 'image_link', 'facebook_link', 'upcoming_shows_count',
+                 'updated_at']
+show_fields = ['id', 'venue_id', 'venue_name', 'venue_image_link', 'artist_id', 'artist_name',
+               'artist_image_link', 'start_time', 'end_time', 'updated_at']
+
+
+def genre_filter(model, genre):
+    link = genre_links[model]
+    return model.id.in_(select([link]).where(and_(link.table.c.genre_id == Genre.id, Genre.name == genre)))
+
+
+def show_filters(query):
+    filters = []
+    for key, column in (('venue_id', Show.venue_id), ('artist_id', Show.artist_id)):
+        if key in query:
+            filters.append(column == integer(query[key], key))
+    if query.get('upcoming') in ('1', 'true'):
+        filters.append(Show.start_time >= datetime.now())
+    return filters
+
+
+# per resource: the model, its public fields, the computed ones, the list
+# order (unique last column for the cursor) and the list filters
+resources = {
+    'venues': (Venue, venue_fields, {'genres': joined_genres}, [Venue.id], lambda query: [
+        genre_filter(Venue, query['genre']) if key == 'genre' else getattr(Venue, key) == query[key]
+        for key in ('genre', 'state', 'city') if key in query]),
+    'artists': (Artist, artist_fields, {'genres': joined_genres}, [Artist.id], lambda query: [
+        genre_filter(Artist, query['genre']) if key == 'genre' else getattr(Artist, key) == query[key]
+        for key in ('genre', 'state') if key in query]),
+    'shows': (Show, show_fields, {}, [Show.start_time, Show.id], show_filters),
+}
+
+
+def integer(value, name):
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPError(400, '%s must be an integer' % name)
+
+
+def selected_fields(resource, query):
+    model, fields, computed, order, filters = resource
+    if not query.get('fields'):
+        return fields + sorted(computed)
+    wanted = [field.strip() for field in query['fields'].split(',') if field.strip()]
+    unknown = [field for field in wanted if field not in fields and field not in computed]
+    if unknown:
+        raise HTTPError(400, 'unknown fields: ' + ', '.join(unknown))
+    return wanted
+
+
+def parent_fields(model, wanted):
+    # SHOW_READ_MODE = 'joined' stores no name or image copies on shows
+    return model is Show and names_joined() and any(name in show_name_columns for name in wanted)
+
+
+def columns_for(resource, wanted, extra=()):
+    # the requested fields plus any the query needs itself (cursor columns)
+    model, fields, computed, order, filters = resource
+    columns = []
+    for name in list(wanted) + [column.key for column in extra if column.key not in wanted]:
+        if name in computed:
+            columns.append(computed[name](model))
+        elif parent_fields(model, [name]):
+            columns.append(show_name_columns[name].label(name))
+        else:
+            columns.append(getattr(model, name))
+    return columns
+
+
+def select_fields(resource, wanted, extra=()):
+    statement = select(columns_for(resource, wanted, extra))
+    if parent_fields(resource[0], wanted):
+        statement = join_show_parents(statement.select_from(Show))
+    return statement
+
+
+def serialise(row, wanted):
+    item = {}
+    for name in wanted:
+        value = getattr(row, name)
+        if name == 'genres':
+            value = value.split(',') if value else []
+        item[name] = plain(value)
+    return item
+
+
+async def list_resource(name, query):
+    resource = resources[name]
+    model, fields, computed, order, filters = resource
+    wanted = selected_fields(resource, query)
+    limit = min(integer(query.get('limit', config['PAGE_SIZE']), 'limit'), config['API_MAX_PAGE_SIZE'])
+    if limit < 1:
+        raise HTTPError(400, 'limit must be positive')
+
+    statement = select_fields(resource, wanted, order)
+    for criterion in filters(query):
+        statement = statement.where(criterion)
+    statement = keyset_select(statement, order, query.get('after'), limit)
+    async with engine.connect() as connection:
+        rows = (await connection.execute(statement)).fetchall()
+    rows, cursor = split_page(rows, order, limit)
+
+    links = {}
+    if cursor:
+        links['next'] = '/api/v1/%s?%s' % (name, urlencode(dict(query, after=cursor)))
+    return {'data': [serialise(row, wanted) for row in rows], 'next': cursor, 'links': links}
+
+
+async def get_resource(name, id, query):
+    resource = resources[name]
+    model = resource[0]
+    wanted = selected_fields(resource, query)
+    statement = select_fields(resource, wanted).where(model.id == id)
+    async with engine.connect() as connection:
+        row = (await connection.execute(statement)).first()
+    if row is None:
+        raise HTTPError(404, '%s %d not found' % (name[:-1], id))
+    return {'data': serialise(row, wanted)}
+
+
+route = re.compile(r'^/api/v1/(venues|artists|shows)(?:/(\d+))?/?$')
+
+
+def compress(body, accepted):
+    # small bodies are not worth the CPU or the header
+    if len(body) < config['API_COMPRESS_MIN_BYTES']:
+        return body, None
+    if brotli is not None and 'br' in accepted:
+        return brotli.compress(body, quality=5), 'br'
+    if 'gzip' in accepted:
+        return gzip.compress(body, compresslevel=6), 'gzip'
+    return body, None
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+
+    query = dict(parse_qsl(scope['query_string'].decode('latin-1')))
+    match = route.match(scope['path'])
+    try:
+        if match is None:
+            raise HTTPError(404, 'not found')
+        if scope['method'] not in ('GET', 'HEAD'):
+            raise HTTPError(405, 'only GET is supported')
+        name, id = match.groups()
+        payload = await (get_resource(name, int(id), query) if id else list_resource(name, query))
+        status = 200
+    except HTTPError as error:
+        status, payload = error.status, {'error': str(error)}
+
+    headers = dict(scope['headers'])
+    accepted = [part.split(';')[0].strip() for part in headers.get(b'accept-encoding', b'').decode().split(',')]
+    body, encoding = compress(json.dumps(payload).encode('utf-8'), accepted)
+    response_headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+                        (b'vary', b'Accept-Encoding')]
+    if encoding:
+        response_headers.append((b'content-encoding', encoding.encode()))
+    await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+    await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else body})
@@ -2,23 +2,42 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-from datetime import datetime
-import json
+from datetime import datetime, timedelta, timezone
+import hashlib
+import os
+from functools import wraps
+from itertools import groupby
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import click
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify, abort, stream_with_context, make_response, g, has_request_context
 from flask.globals import session
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
+from routing import RoutingSQLAlchemy, replica_engines
 import logging
-from logging import Formatter, FileHandler
 from flask_wtf import Form
 from flask_migrate import Migrate, show
 from sqlalchemy.orm import backref
 from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.sql.base import Executable
 from sqlalchemy import select
 from forms import *
+from search import NGramIndex, RadixTrie
+import geo
+from geo import Gazetteer
+import math
+from pagination import keyset_page
+from cache import make_cache
+from tasks import BackgroundQueue
+from availability import free_slots
+from bulk import read_rows, chunked, encode_rows, gzip_chunks
+from werkzeug.datastructures import MultiDict
+import time
+from metrics import InstrumentedQueuePool, prometheus_text
+from instrumentation import instrument
+from requestlog import log_requests, log_errors, timed_render
+from sqlalchemy import event
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -26,8 +45,19 @@ from forms import *
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
+if 'pool_size' in app.config['SQLALCHEMY_ENGINE_OPTIONS']:
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'].setdefault('poolclass', InstrumentedQueuePool)
+db = RoutingSQLAlchemy(app)
 migrate = Migrate(app, db)
+instrument(app)
+
+
+@event.listens_for(db.session, 'after_begin')
+def limit_statement_time(session, transaction, connection):
+    # only requests get DB_STATEMENT_TIMEOUT. SET LOCAL ends with the
+    # transaction, so the pooled connection carries nothing over.
+    if has_request_context() and app.config['DB_STATEMENT_TIMEOUT'] and connection.dialect.name == 'postgresql':
+        connection.execute(db.text('SET LOCAL statement_timeout = %d' % app.config['DB_STATEMENT_TIMEOUT']))
 
 
 #----------------------------------------------------------------------------#
@@ -35,7 +65,79 @@ migrate = Migrate(app, db)
 #----------------------------------------------------------------------------#
 
 
-class Venue(db.Model):
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+def as_utc(value):
+    # naive datetimes (user input, sqlite rows) are taken to be UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class Genre(db.Model):
+    __tablename__ = 'genres'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+
+# the primary keys serve "genres of this venue", the (genre_id, ...) indexes
+# serve "venues of this genre" for the ?genre= filters
+venue_genres = db.Table(
+    'venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id', 'genre_id', 'venue_id'),
+)
+
+artist_genres = db.Table(
+    'artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id'), primary_key=True),
+    db.Index('ix_artist_genres_genre_id', 'genre_id', 'artist_id'),
+)
+
+
+def find_genres(names):
+    # the Genre rows for names, creating the ones not stored yet
+    names = list(dict.fromkeys(name.strip() for name in names if name and name.strip()))
+    found = {}
+    if names:
+        with db.session.no_autoflush:
+            found = {genre.name: genre for genre in Genre.query.filter(Genre.name.in_(names))}
+        for obj in db.session.new:
+            if isinstance(obj, Genre):
+                found.setdefault(obj.name, obj)
+    for name in names:
+        if name not in found:
+            found[name] = Genre(name=name)
+            db.session.add(found[name])
+    return [found[name] for name in names]
+
+
+class GenresMixin(object):
+    # genres are read and assigned as a list of names, as the forms use them.
+    # pages that read the names along with the row (load_with_shows) set
+    # genre_names and skip loading genre_rows.
+    genre_names = None
+
+    @property
+    def genres(self):
+        if self.genre_names is not None:
+            return self.genre_names
+        return [genre.name for genre in self.genre_rows]
+
+    @genres.setter
+    def genres(self, names):
+        self.genre_names = None
+        rows = find_genres(names)
+        if set(rows) != set(self.genre_rows):
+            self.genre_rows = rows
+            # a collection change alone issues no UPDATE for the parent row
+            self.updated_at = utcnow()
+
+
+class Venue(GenresMixin, db.Model):
     __tablename__ = 'Venue'
 
     id = db.Column(db.Integer, primary_key=True)
@@ -46,15 +148,28 @@ class Venue(db.Model):
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
-    genres = db.Column(db.String(1000))
     website = db.Column(db.String(250))
     seeking_talent = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String(500))
 
+    # city-centre coordinates, see locate()
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12))
+
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow, onupdate=utcnow)
+
     shows = db.relationship('Show', backref="venue", cascade="all, delete, delete-orphan", lazy=True)
+    genre_rows = db.relationship('Genre', secondary=venue_genres, order_by=Genre.name)
+
+    __table_args__ = (
+        db.Index('ix_venue_state_city', 'state', 'city', 'id'),
+        db.Index('ix_venue_geohash', 'geohash'),
+    )
 
 
-class Artist(db.Model):
+class Artist(GenresMixin, db.Model):
     __tablename__ = 'Artist'
 
     id = db.Column(db.Integer, primary_key=True)
@@ -62,11 +177,18 @@ class Artist(db.Model):
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
 
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow, onupdate=utcnow)
+
     shows = db.relationship('Show', backref="artist", cascade="all, delete, delete-orphan")
+    genre_rows = db.relationship('Genre', secondary=artist_genres, order_by=Genre.name)
+
+
+def default_end_time(context):
+    return context.get_current_parameters()['start_time'] + timedelta(minutes=app.config['SHOW_DEFAULT_MINUTES'])
 
 
 class Show(db.Model):
@@ -81,6 +203,90 @@ class Show(db.Model):
     artist_image_link = db.Column(db.String(500))
     venue_image_link = db.Column(db.String(500))
     start_time = db.Column(db.DateTime(timezone=True), nullable=False)
+    end_time = db.Column(db.DateTime(timezone=True), nullable=False, default=default_end_time)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow, onupdate=utcnow)
+
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_start_time', 'start_time'),
+        db.Index('ix_shows_updated_at', 'updated_at'),
+    )
+
+
+class ShowArchive(db.Model):
+    # one gzip JSONL file of shows per archived month, see archive-shows
+    __tablename__ = 'show_archives'
+
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Date, nullable=False, unique=True)
+    path = db.Column(db.String(500), nullable=False)
+    rows = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow)
+
+
+# the venues and artists with shows in each archive, so their pages open only
+# the files holding those shows
+show_archive_parents = db.Table(
+    'show_archive_parents',
+    db.Column('kind', db.String(10), primary_key=True),
+    db.Column('parent_id', db.Integer, primary_key=True),
+    db.Column('archive_id', db.Integer, db.ForeignKey('show_archives.id', ondelete='CASCADE'), primary_key=True),
+)
+
+
+genre_links = {Venue: venue_genres.c.venue_id, Artist: artist_genres.c.artist_id}
+
+
+def with_genre(query, model, genre):
+    # narrow a listing to one genre through the (genre_id, ...) index
+    if not genre:
+        return query
+    link = genre_links[model]
+    return query.filter(model.id.in_(db.select([link]).where(db.and_(
+        link.table.c.genre_id == Genre.id, Genre.name == genre))))
+
+
+def joined_genres(model):
+    # each row's genre names as one comma-joined string, as the importer reads them
+    link = genre_links[model]
+    aggregate = db.func.string_agg if db.engine.dialect.name == 'postgresql' else db.func.group_concat
+    return db.select([aggregate(Genre.name, ',')]).where(db.and_(
+        link.table.c.genre_id == Genre.id, link == model.id)).as_scalar()
+
+#----------------------------------------------------------------------------#
+# Index check.
+#----------------------------------------------------------------------------#
+
+
+def missing_indexes():
+    # indexes declared on the models that the connected database lacks,
+    # e.g. because `flask db upgrade` has not been run
+    inspector = db.inspect(db.engine)
+    missing = []
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        missing += [index.name for index in table.indexes if index.name not in existing]
+    return missing
+
+
+index_check_done = False
+
+
+@app.before_request
+def check_indexes():
+    global index_check_done
+    if index_check_done:
+        return
+    index_check_done = True
+    try:
+        missing = missing_indexes()
+    except Exception as error:
+        app.logger.warning('could not check database indexes: ' + error.__str__())
+        return
+    if missing:
+        app.logger.warning('missing database indexes: ' + ', '.join(missing) +
+                           ' -- run `flask db upgrade`')
 
 #----------------------------------------------------------------------------#
 # Filters.
@@ -98,90 +304,757 @@ def format_datetime(value, format='medium'):
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Upcoming show counters.
+#----------------------------------------------------------------------------#
+
+
+def is_upcoming(start_time):
+    return start_time >= datetime.now(start_time.tzinfo)
+
+
+@event.listens_for(db.session, 'after_flush')
+def update_upcoming_counts(session, flush_context):
+    # keep Venue/Artist.upcoming_shows_count in step with inserted and deleted
+    # shows (including cascade deletes) inside the same transaction
+    deltas = {}
+    for delta, shows in ((1, session.new), (-1, session.deleted)):
+        for show in shows:
+            if isinstance(show, Show) and is_upcoming(show.start_time):
+                for model, id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+                    deltas[model, id] = deltas.get((model, id), 0) + delta
+
+    # the counter is derived from the shows, not an edit of the parent: keep
+    # updated_at as it is, so export --since, the ETags and the search index
+    # stamps don't see a change
+    for (model, id), delta in deltas.items():
+        if delta:
+            session.execute(model.__table__.update().where(model.id == id).values(
+                upcoming_shows_count=model.upcoming_shows_count + delta, updated_at=model.updated_at))
+
+
+def refresh_upcoming_counts(since=None):
+    # shows only leave the "upcoming" set by time passing, which no write
+    # observes. recount the parents of shows that started after `since`, or
+    # every parent when since is None. safe to run repeatedly: only counts
+    # that moved are written, and like update_upcoming_counts they leave
+    # updated_at alone.
+    now = datetime.now()
+    for model, foreign_key in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        count = db.select([db.func.count(Show.id)]).where(
+            db.and_(foreign_key == model.id, Show.start_time >= now)).as_scalar()
+        query = db.session.query(model)
+        if since is not None:
+            query = query.filter(model.id.in_(db.session.query(foreign_key).filter(
+                Show.start_time >= since, Show.start_time < now)))
+        query.filter(model.upcoming_shows_count != count).update(
+            {model.upcoming_shows_count: count, model.updated_at: model.updated_at}, synchronize_session=False)
+    db.session.commit()
+
+
+@app.cli.command('refresh-show-counts')
+@click.option('--minutes', default=60, help='recount parents of shows that started in this window')
+@click.option('--all', 'everything', is_flag=True, help='recount every venue and artist')
+def refresh_show_counts_command(minutes, everything):
+    """Expire shows that moved into the past from the upcoming counters (run from cron)."""
+    refresh_upcoming_counts(None if everything else datetime.now() - timedelta(minutes=minutes))
+
+
+#----------------------------------------------------------------------------#
+# Denormalised show names.
+#----------------------------------------------------------------------------#
+
+background = BackgroundQueue(app)
+
+
+def names_joined():
+    # SHOW_READ_MODE = 'joined' stops maintaining the copies on Show and
+    # reads names and images from the eager-loaded venue and artist instead
+    return app.config['SHOW_READ_MODE'] == 'joined'
+
+
+def show_load_options(*relationships):
+    return [joinedload(relationship) for relationship in relationships] if names_joined() else []
+
+
+# the parent columns behind each copied Show column
+show_name_columns = {
+    'venue_name': Venue.name,
+    'venue_image_link': Venue.image_link,
+    'artist_name': Artist.name,
+    'artist_image_link': Artist.image_link,
+}
+
+
+def show_columns():
+    # Show's columns for Core reads (exports, the JSON API). in joined mode
+    # the copies are not stored, so the name and image columns come from the
+    # parents; join them with join_show_parents.
+    columns = list(Show.__table__.columns)
+    if names_joined():
+        columns = [show_name_columns[column.name].label(column.name) if column.name in show_name_columns else column
+                   for column in columns]
+    return columns
+
+
+def join_show_parents(query):
+    return query.outerjoin(Venue, Show.venue_id == Venue.id).outerjoin(Artist, Show.artist_id == Artist.id)
+
+
+def fill_show_names(shows):
+    # in joined mode, present the parents' values under the usual Show
+    # attributes so templates read the same in both modes
+    for show in shows:
+        if show is not None and names_joined():
+            set_committed_value(show, 'venue_name', show.venue.name)
+            set_committed_value(show, 'venue_image_link', show.venue.image_link)
+            set_committed_value(show, 'artist_name', show.artist.name)
+            set_committed_value(show, 'artist_image_link', show.artist.image_link)
+        yield show
+
+
+def copy_show_names(kind, id):
+    # shows copy their venue's and artist's name and image. bring the copies
+    # of one parent up to date in short chunked transactions; rows already
+    # current are skipped, so running it again (or concurrently) is harmless.
+    model, foreign_key, name, image_link = {
+        'venue': (Venue, Show.venue_id, Show.venue_name, Show.venue_image_link),
+        'artist': (Artist, Show.artist_id, Show.artist_name, Show.artist_image_link),
+    }[kind]
+
+    parent = db.session.query(model.name, model.image_link).filter(model.id == id).first()
+    if parent is None:
+        return
+
+    stale = db.session.query(Show.id).filter(foreign_key == id, db.or_(
+        name.is_distinct_from(parent.name), image_link.is_distinct_from(parent.image_link)))
+    while True:
+        ids = [row.id for row in stale.order_by(Show.id).limit(app.config['DENORM_SYNC_CHUNK_SIZE'])]
+        if not ids:
+            break
+        db.session.query(Show).filter(Show.id.in_(ids)).update({
+            name: parent.name,
+            image_link: parent.image_link
+        }, synchronize_session=False)
+        db.session.commit()
+        # bulk updates bypass the session hooks
+        cache.bump(['shows', kind + '-names'])
+
+
+def sync_show_names(kind, id):
+    if names_joined():
+        return
+    if app.config['DENORM_SYNC_ASYNC']:
+        background.enqueue(('show-names', kind, int(id)), copy_show_names, kind, int(id))
+    else:
+        copy_show_names(kind, int(id))
+
+
+@app.cli.command('sync-show-names')
+def sync_show_names_command():
+    """Re-copy every venue and artist name into its shows (e.g. after a crash lost queued syncs)."""
+    for kind, model in (('venue', Venue), ('artist', Artist)):
+        for row in db.session.query(model.id).all():
+            copy_show_names(kind, row.id)
+
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+
+def like_pattern(term, prefix_only=False):
+    # escape LIKE wildcards so user input is matched literally
+    term = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return term + '%' if prefix_only else '%' + term + '%'
+
+
+def search_venues_query(term, limit):
+    # matches name, city, state and genres case-insensitively. on postgres the
+    # name/city/state ILIKE filters are served by the pg_trgm GIN indexes from
+    # migration 3b9f0c1d2e4a; on sqlite they fall back to a scan. genre
+    # matches are looked up apart and unioned in: an EXISTS inside the OR
+    # would stop postgres combining those indexes and scan every venue.
+    pattern = like_pattern(term)
+    rank = db.case([
+        (db.func.lower(Venue.name) == term.lower(), 0),
+        (Venue.name.ilike(like_pattern(term, prefix_only=True), escape='\\'), 1),
+        (Venue.name.ilike(pattern, escape='\\'), 2),
+    ], else_=3)
+
+    matches = db.select([Venue.id]).where(db.or_(
+        Venue.name.ilike(pattern, escape='\\'),
+        Venue.city.ilike(pattern, escape='\\'),
+        Venue.state.ilike(pattern, escape='\\'),
+    ))
+    # the genres table is a few dozen rows, so this scan is cheap; the venues
+    # come from ix_venue_genres_genre_id
+    genre_ids = [id for id, in db.session.query(Genre.id).filter(Genre.name.ilike(pattern, escape='\\'))]
+    if genre_ids:
+        matches = matches.union(db.select([venue_genres.c.venue_id]).where(venue_genres.c.genre_id.in_(genre_ids)))
+    matches = matches.alias('matches')
+
+    query = db.session.query(Venue.id, Venue.name, Venue.upcoming_shows_count).join(
+        matches, matches.c.id == Venue.id)
+
+    order = [rank]
+    if term and db.engine.dialect.name == 'postgresql':
+        order.append(db.func.similarity(Venue.name, term).desc())
+    order.append(Venue.name)
+
+    return query.order_by(*order).limit(limit)
+
+
+# artist and venue names are searched in memory. each index is built on first
+# use and kept current by the session hooks below, so lookups never touch the
+# database. every worker process holds its own copy; changes made by other
+# workers or by `flask import` are caught by index_is_stale and the index is
+# rebuilt.
+artist_index = NGramIndex()
+suggest_index = RadixTrie()
+index_stamps = {}
+
+
+def index_is_stale(name, *models):
+    # at most every SEARCH_INDEX_CHECK_SECONDS, compare the newest updated_at
+    # and the row count of the indexed tables with what the index was built
+    # from: an insert or rename moves the first, a delete the second
+    stamp, checked = index_stamps.get(name, (None, 0))
+    if time.monotonic() - checked < app.config['SEARCH_INDEX_CHECK_SECONDS']:
+        return False
+    current = [tuple(db.session.query(db.func.max(model.updated_at), db.func.count(model.id)).one())
+               for model in models]
+    # the stamp is read before the rebuild, so a change landing during the
+    # rebuild is caught by the next check rather than missed
+    index_stamps[name] = (current, time.monotonic())
+    return current != stamp
+
+
+def artist_search_index():
+    if index_is_stale('artists', Artist) or not artist_index.loaded:
+        artist_index.load(db.session.query(Artist.id, Artist.name).yield_per(1000))
+    return artist_index
+
+
+def suggest_search_index():
+    if index_is_stale('suggest', Artist, Venue) or not suggest_index.loaded:
+        rows = [(('artist', id), name) for id, name in db.session.query(Artist.id, Artist.name).yield_per(1000)]
+        rows += [(('venue', id), name) for id, name in db.session.query(Venue.id, Venue.name).yield_per(1000)]
+        suggest_index.load(rows)
+    return suggest_index
+
+
+@event.listens_for(db.session, 'after_flush')
+def collect_name_changes(session, flush_context):
+    changes = session.info.setdefault('name_changes', [])
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, (Artist, Venue)):
+            changes.append(('add', obj.__tablename__.lower(), obj.id, obj.name))
+    for obj in session.deleted:
+        if isinstance(obj, (Artist, Venue)):
+            changes.append(('remove', obj.__tablename__.lower(), obj.id, None))
+
+
+@event.listens_for(db.session, 'after_commit')
+def apply_name_changes(session):
+    for action, kind, id, name in session.info.pop('name_changes', []):
+        targets = [(suggest_index, (kind, id))]
+        if kind == 'artist':
+            targets.append((artist_index, id))
+        for index, key in targets:
+            if action == 'add':
+                index.add(key, name)
+            else:
+                index.remove(key)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_name_changes(session):
+    session.info.pop('name_changes', None)
+
+
+#----------------------------------------------------------------------------#
+# Geo search.
+#----------------------------------------------------------------------------#
+
+gazetteer = Gazetteer(app.config['GAZETTEER_PATH'])
+
+
+def locate(venue):
+    # city-centre coordinates from the bundled gazetteer, cleared when the
+    # city is not listed
+    found = gazetteer.locate(venue.city, venue.state)
+    venue.latitude, venue.longitude = found or (None, None)
+    venue.geohash = geo.encode(*found) if found else None
+    return found is not None
+
+
+@event.listens_for(db.session, 'before_flush')
+def locate_venues(session, flush_context, instances):
+    # new venues and venues whose city or state changed get coordinates
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Venue):
+            continue
+        attrs = db.inspect(obj).attrs
+        if obj in session.new and obj.latitude is None or \
+                attrs.city.history.has_changes() or attrs.state.history.has_changes():
+            locate(obj)
+
+
+def nearby_venues(latitude, longitude, km, limit):
+    # candidates come from range scans of ix_venue_geohash over the cells
+    # around the point and are ordered by a flat-earth distance that needs
+    # no trigonometry in SQL. that order drifts from the exact one towards
+    # the edge of large radii, so twice the candidates are read and ranked
+    # by exact distance here.
+    shrink = math.cos(math.radians(latitude))
+    north = Venue.latitude - latitude
+    east = (Venue.longitude - longitude) * shrink
+    rows = db.session.query(
+        Venue.id, Venue.name, Venue.city, Venue.state, Venue.latitude, Venue.longitude, Venue.upcoming_shows_count
+    ).filter(db.or_(*[
+        db.and_(Venue.geohash >= cell, Venue.geohash < cell + '~')
+        for cell in geo.covering_cells(latitude, longitude, km)
+    ])).order_by(north * north + east * east, Venue.id).limit(limit * 2)
+
+    found = []
+    for row in rows:
+        distance = geo.haversine_km(latitude, longitude, row.latitude, row.longitude)
+        # a row outside the radius does not mean the later ones are
+        if distance > km:
+            continue
+        found.append((row, distance))
+    found.sort(key=lambda item: (item[1], item[0].id))
+    return found[:limit]
+
+
+@app.cli.command('geocode-venues')
+@click.option('--all', 'everything', is_flag=True, help='also relocate venues that have coordinates')
+@click.option('--gazetteer', 'path', help='CSV of city,state,latitude,longitude (default: GAZETTEER_PATH)')
+@click.option('--batch-size', default=1000, help='rows per UPDATE and transaction')
+def geocode_venues_command(everything, path, batch_size):
+    """Fill in venue coordinates from the offline gazetteer."""
+    places = Gazetteer(path) if path else gazetteer
+    query = db.session.query(Venue.id, Venue.city, Venue.state)
+    if not everything:
+        query = query.filter(Venue.latitude.is_(None))
+    update = Venue.__table__.update().where(Venue.id == db.bindparam('venue_id'))
+
+    located = 0
+    unlisted = {}
+    for chunk in chunked(query.order_by(Venue.id).all(), batch_size):
+        values = []
+        for id, city, state in chunk:
+            found = places.locate(city, state)
+            if found is None:
+                unlisted[(city, state)] = unlisted.get((city, state), 0) + 1
+                continue
+            values.append({'venue_id': id, 'latitude': found[0], 'longitude': found[1],
+                           'geohash': geo.encode(*found)})
+        if values:
+            db.session.execute(update, values)
+            db.session.commit()
+            located += len(values)
+
+    click.echo('%d venues located, %d not in the gazetteer' % (located, sum(unlisted.values())))
+    for (city, state), count in sorted(unlisted.items(), key=lambda item: -item[1])[:20]:
+        click.echo('  %s, %s: %d' % (city, state, count))
+
+
+#----------------------------------------------------------------------------#
+# Detail pages.
+#----------------------------------------------------------------------------#
+
+
+def load_with_shows(model, foreign_key, id):
+    # one round trip for the parent, its genres, its shows split into past
+    # and upcoming, and both counts (window aggregates repeated on every
+    # row). served by the (venue_id, start_time) and (artist_id, start_time)
+    # indexes.
+    now = datetime.now()
+    is_past = Show.start_time < now
+    rows = db.session.query(
+        model, Show, is_past.label('is_past'),
+        db.func.count(db.case([(is_past, Show.id)])).over(),
+        db.func.count(db.case([(Show.start_time >= now, Show.id)])).over(),
+        joined_genres(model),
+    ).outerjoin(Show, foreign_key == model.id).filter(model.id == id).order_by(Show.start_time).options(
+        # the parent side is already in the identity map
+        *show_load_options(Show.artist if model is Venue else Show.venue)).all()
+
+    if not rows:
+        abort(404)
+
+    parent = rows[0][0]
+    parent.past_shows = list(fill_show_names(row[1] for row in rows if row[1] is not None and row[2]))
+    parent.upcoming_shows = list(fill_show_names(row[1] for row in rows if row[1] is not None and not row[2]))
+    parent.past_shows_count = rows[0][3]
+    # exact count for this instant; not a change to the stored counter
+    set_committed_value(parent, 'upcoming_shows_count', rows[0][4])
+    parent.genre_names = sorted(rows[0][5].split(',')) if rows[0][5] else []
+    return parent
+
+
+#----------------------------------------------------------------------------#
+# Booking.
+#----------------------------------------------------------------------------#
+
+
+def booking_conflicts(start_time, end_time, venue_id, artist_id):
+    # shows at the venue or with the artist overlapping [start_time, end_time).
+    # no show runs longer than SHOW_MAX_MINUTES, so only shows starting in
+    # that window before end_time can overlap: a bounded range scan of the
+    # (venue_id, start_time) and (artist_id, start_time) indexes.
+    earliest = start_time - timedelta(minutes=app.config['SHOW_MAX_MINUTES'])
+    conflicts = {}
+    for foreign_key, id in ((Show.venue_id, venue_id), (Show.artist_id, artist_id)):
+        for show in Show.query.filter(
+                foreign_key == id, Show.start_time > earliest, Show.start_time < end_time,
+                Show.end_time > start_time):
+            # a show at the venue with the artist clashes on both sides
+            conflicts[show.id] = show
+    return sorted(conflicts.values(), key=lambda show: (show.start_time, show.id))
+
+
+def busy_times(venue_id, start, end):
+    # (start_time, end_time) of the venue's shows that reach into [start, end),
+    # in UTC whatever the database hands back
+    earliest = start - timedelta(minutes=app.config['SHOW_MAX_MINUTES'])
+    rows = db.session.query(Show.start_time, Show.end_time).filter(
+        Show.venue_id == venue_id, Show.start_time > earliest, Show.start_time < end,
+        Show.end_time > start).order_by(Show.start_time)
+    return [(as_utc(start_time), as_utc(end_time)) for start_time, end_time in rows]
+
+
+#----------------------------------------------------------------------------#
+# Read replicas.
+#----------------------------------------------------------------------------#
+
+
+def read_only(view):
+    # let the view's queries go to a replica (see routing.py), unless this
+    # client wrote something moments ago and must see it
+    @wraps(view)
+    def wrapper(**kwargs):
+        g.use_replica = session.get('primary_until', 0) < time.time()
+        return view(**kwargs)
+    return wrapper
+
+
+@event.listens_for(db.session, 'after_commit')
+def remember_write(session):
+    if has_request_context():
+        g.wrote = True
+
+
+@app.after_request
+def stick_to_primary(response):
+    if g.get('wrote') and app.config['SQLALCHEMY_REPLICA_URIS']:
+        session['primary_until'] = time.time() + app.config['REPLICA_STICKY_SECONDS']
+    return response
+
+
+#----------------------------------------------------------------------------#
+# Streaming.
+#----------------------------------------------------------------------------#
+
+
+def render_list(template_name, **context):
+    # list pages are sent while their rows are still being read, so the first
+    # bytes go out before the query finishes and the page is never held
+    # whole in memory. STREAM_TEMPLATES = False renders them in one piece.
+    if not app.config.get('STREAM_TEMPLATES'):
+        return render_template(template_name, **context)
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering(64)
+    return Response(stream_with_context(timed_render(g, stream)))
+
+
+#----------------------------------------------------------------------------#
+# Caching.
+#----------------------------------------------------------------------------#
+
+cache = make_cache(app.config)
+
+
+def cached(*tags):
+    # cache a GET view's response under its path and the current versions of
+    # its tags ('{venue_id}' is filled from the view arguments). bumping a
+    # tag version on commit makes every entry built from it unreachable.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            # pages carrying flashed messages are per-user, and a client that
+            # just wrote reads the primary (see read_only), not older copies
+            if request.method != 'GET' or '_flashes' in session or session.get('primary_until', 0) > time.time():
+                return view(**kwargs)
+
+            names = [tag.format(**kwargs) for tag in tags]
+            key = 'view:' + request.full_path + ':' + ','.join(map(str, cache.versions(names)))
+            # a lagging replica may not have the write behind a recent bump
+            # yet; its page must not be stored under the new version
+            storable = not (g.get('use_replica') and app.config['SQLALCHEMY_REPLICA_URIS']) or \
+                time.time() - cache.last_bump(names) > app.config['REPLICA_STICKY_SECONDS']
+            hit = cache.get(key)
+            if hit is not None:
+                body, mimetype = hit
+                return Response(body, mimetype=mimetype)
+
+            response = make_response(view(**kwargs))
+            if response.status_code != 200 or not storable:
+                return response
+            if not response.is_streamed:
+                cache.set(key, (response.get_data(), response.mimetype))
+                return response
+
+            # keep a copy of the chunks as they stream and cache the page once
+            # it has been sent in full
+            def capture(chunks):
+                body = []
+                try:
+                    for chunk in chunks:
+                        body.append(chunk if isinstance(chunk, bytes) else chunk.encode(response.charset))
+                        yield chunk
+                finally:
+                    if hasattr(chunks, 'close'):
+                        chunks.close()
+                cache.set(key, (b''.join(body), response.mimetype))
+
+            response.response = capture(response.response)
+            return response
+        return wrapper
+    return decorator
+
+
+@event.listens_for(db.session, 'after_flush')
+def collect_cache_tags(session, flush_context):
+    tags = session.info.setdefault('cache_tags', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Venue):
+            # show pages carry the venue name and image (copied by
+            # copy_show_names, or joined); invalidate_cache below bumps the
+            # tags once the edit commits
+            tags.update(['venues', 'venue:%s' % obj.id, 'venue-names', 'shows'])
+        elif isinstance(obj, Artist):
+            tags.update(['artists', 'artist:%s' % obj.id, 'artist-names', 'shows'])
+        elif isinstance(obj, Show):
+            tags.update(['shows', 'venue:%s' % obj.venue_id, 'artist:%s' % obj.artist_id])
+
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_cache(session):
+    tags = session.info.pop('cache_tags', None)
+    if tags:
+        cache.bump(tags)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_cache_tags(session):
+    session.info.pop('cache_tags', None)
+
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+
+def conditional(validators):
+    # validators(**view_args) returns the parts of an ETag from a cheap query,
+    # or None to let the view answer (e.g. with a 404). a request whose
+    # If-None-Match still matches gets a 304 without the view or its template
+    # ever running. no Last-Modified is sent: the ETags also cover shows
+    # starting and shows being deleted, which leave no newer timestamp, so an
+    # If-Modified-Since check would answer 304 for a changed page.
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            parts = None if '_flashes' in session else validators(**kwargs)
+            if parts is None:
+                return view(**kwargs)
+
+            etag = hashlib.sha1(repr((request.full_path,) + tuple(parts)).encode()).hexdigest()
+            fresh = request.if_none_match.contains(etag)
+
+            response = Response(status=304) if fresh else make_response(view(**kwargs))
+            response.set_etag(etag)
+            # always revalidate; the 304 makes that cheap
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+def show_validators(model, foreign_key, id_arg):
+    # the parent's own version, its newest show version, and counts that move
+    # when a show is deleted or starts. in joined mode the page also shows
+    # the other side's names, which an edit there no longer copies into the
+    # shows, so the newest of those versions counts too.
+    other, other_key = (Artist, Show.artist_id) if model is Venue else (Venue, Show.venue_id)
+
+    def validators(**kwargs):
+        now = datetime.now()
+        query = db.session.query(
+            model.updated_at, db.func.max(Show.updated_at), db.func.count(Show.id),
+            db.func.count(db.case([(Show.start_time >= now, Show.id)]))
+        ).outerjoin(Show, foreign_key == model.id)
+        if names_joined():
+            query = query.add_columns(db.func.max(other.updated_at)).outerjoin(other, other_key == other.id)
+        row = query.filter(model.id == kwargs[id_arg]).group_by(model.id).first()
+        return row
+    return validators
+
+
+def shows_validators():
+    # the versions of exactly the rows on the requested page, and in joined
+    # mode of the venues and artists whose names it shows
+    columns = [Show.start_time, Show.id, Show.updated_at]
+    if names_joined():
+        columns += [Venue.updated_at.label('venue_updated_at'), Artist.updated_at.label('artist_updated_at')]
+    query = db.session.query(*columns)
+    if names_joined():
+        query = query.outerjoin(Venue, Show.venue_id == Venue.id).outerjoin(Artist, Show.artist_id == Artist.id)
+    page = keyset_page(query, [Show.start_time, Show.id], request.args.get('after'), app.config['PAGE_SIZE'])
+    return [tuple(row[1:]) for row in page] + [page.next_cursor]
+
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
 
 @app.route('/')
+@cached()
 def index():
     return render_template('pages/home.html')
 
 
+@app.route('/metrics')
+def metrics():
+    # connection pool gauges and counters for this worker process
+    pools = {'primary': db.engine.pool}
+    for number, engine in enumerate(replica_engines(app)):
+        pools['replica%d' % number] = engine.pool
+    return Response(prometheus_text(pools), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/suggest')
+def suggest():
+    # typeahead for the navbar search boxes, answered from memory
+    kind = request.args.get('type')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    found = suggest_search_index().suggest(request.args.get('q', '').strip(), limit * 2 if kind else limit)
+    suggestions = [{
+        "type": key[0],
+        "id": key[1],
+        "name": name,
+        "url": url_for('show_' + key[0], **{key[0] + '_id': key[1]})
+    } for key, name in found if kind is None or key[0] == kind]
+    return jsonify({"q": request.args.get('q', ''), "suggestions": suggestions[:limit]})
+
+
 #  Venues
 #  ----------------------------------------------------------------
 def VenuesRoutes():
     @app.route('/venues')
+    @read_only
+    @cached('venues')
     def venues():
-        # TODO: replace with real venues data.
-        #       num_shows should be aggregated based on number of upcoming shows per venue.
-        data = [{
-            "city": "San Francisco",
-            "state": "CA",
-            "venues": [{
-                "id": 1,
-                "name": "The Musical Hop",
-                "num_upcoming_shows": 0,
-            }, {
-                "id": 3,
-                "name": "Park Square Live Music & Coffee",
-                "num_upcoming_shows": 1,
-            }]
-        }]
-
-        areas = {}
-        for venue in db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, db.func.count(Show.id)).outerjoin(Venue.shows).filter(Show.start_time >= datetime.now()).group_by(Venue).all():
-            venues = areas.get(venue[2], {"venues": []})["venues"]
-            venues.append({
-                'id': venue[0],
-                "name": venue[1],
-                "num_upcoming_shows": venue[4]
-            })
-
-            areas[venue.city] = {
-                "city": venue[2],
-                "state": venue[3],
-                "venues": venues
-            }
-
-        return render_template('pages/venues.html', areas=areas.values())
+        # rows arrive ordered by state and city, so each area is one run of
+        # consecutive rows and can be grouped without building a dict
+        query = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, Venue.upcoming_shows_count)
+        page = keyset_page(with_genre(query, Venue, request.args.get('genre')),
+                           [Venue.state, Venue.city, Venue.id], request.args.get('after'), app.config['PAGE_SIZE'])
+
+        areas = ({
+            "city": city,
+            "state": state,
+            "venues": venues
+        } for (state, city), venues in groupby(page, key=lambda venue: (venue.state, venue.city)))
+
+        return render_list('pages/venues.html', areas=areas, page=page, genre=request.args.get('genre'))
+
+    @app.route('/venues/nearby')
+    @read_only
+    def nearby():
+        # the k nearest venues to ?lat=&lon= (or a listed ?city=&state=)
+        # within ?km=, as JSON
+        if 'lat' in request.args or 'lon' in request.args:
+            latitude = request.args.get('lat', type=float)
+            longitude = request.args.get('lon', type=float)
+        else:
+            latitude, longitude = gazetteer.locate(request.args.get('city'), request.args.get('state')) or (None, None)
+        if latitude is None or longitude is None or not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+            abort(400)
+        km = request.args.get('km', app.config['NEARBY_DEFAULT_KM'], type=float)
+        # nan slips through min() and every comparison
+        if not math.isfinite(km):
+            abort(400)
+        km = min(km, app.config['NEARBY_MAX_KM'])
+        limit = min(request.args.get('k', 10, type=int), app.config['NEARBY_MAX_RESULTS'])
+
+        venues = [{
+            "id": row.id,
+            "name": row.name,
+            "city": row.city,
+            "state": row.state,
+            "distance_km": round(distance, 2),
+            "num_upcoming_shows": row.upcoming_shows_count,
+            "url": url_for('show_venue', venue_id=row.id)
+        } for row, distance in nearby_venues(latitude, longitude, km, limit)]
+        return jsonify({"lat": latitude, "lon": longitude, "km": km, "venues": venues})
+
+    @app.route('/venues/<int:venue_id>/availability')
+    @read_only
+    @cached('venue:{venue_id}')
+    def venue_availability(venue_id):
+        # free time at the venue between ?from= and ?to= (dates or times),
+        # leaving out gaps shorter than ?minutes=
+        if db.session.query(Venue.id).filter(Venue.id == venue_id).first() is None:
+            abort(404)
+        # like ?since= on the exports, times without an offset are UTC, so
+        # they compare with the timezone-aware show times
+        try:
+            start = parse_since(request.args.get('from'))
+            end = parse_since(request.args.get('to'))
+        except (ValueError, OverflowError):
+            abort(400)
+        if start is None:
+            abort(400)
+        end = end or start + timedelta(days=7)
+        if end <= start or end - start > timedelta(days=app.config['AVAILABILITY_MAX_DAYS']):
+            abort(400)
+        min_length = timedelta(minutes=request.args.get('minutes', 0, type=int))
+
+        busy = busy_times(venue_id, start, end)
+        return jsonify({
+            "venue_id": venue_id,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "busy": [[busy_start.isoformat(), busy_end.isoformat()] for busy_start, busy_end in busy],
+            "free": [[slot[0].isoformat(), slot[1].isoformat()] for slot in free_slots(busy, start, end, min_length)]
+        })
 
     @app.route('/venues/search', methods=['POST'])
+    @read_only
     def search_venues():
-        # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
-        # seach for Hop should return "The Musical Hop".
-        # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-        response = {
-            "count": 1,
-            "data": [{
-                "id": 2,
-                "name": "The Dueling Pianos Bar",
-                "num_upcoming_shows": 0,
-            }]
-        }
-
-        data = db.session.query(Venue.id, Venue.name, db.func.count(Show.id)).outerjoin(
-            Venue.shows).filter(Show.start_time >= datetime.now()).group_by(Venue.id).all()
+        search_term = request.form.get('search_term', '').strip()
+        data = search_venues_query(
+            search_term, app.config['SEARCH_RESULTS_LIMIT']).all()
 
         results = {
             "count": len(data),
             "data": list(map(lambda row: {"id": row[0], "name": row[1], "num_upcoming_shows": row[2]}, data))
         }
-        return render_template('pages/search_venues.html', results=results, search_term=request.form.get('search_term', ''))
+        return render_template('pages/search_venues.html', results=results, search_term=search_term)
 
     @app.route('/venues/<int:venue_id>')
+    @read_only
+    @conditional(show_validators(Venue, Show.venue_id, 'venue_id'))
+    @cached('venue:{venue_id}', 'artist-names')
     def show_venue(venue_id):
-        venue = Venue.query.get(venue_id)
-
-        venue.past_shows = Show.query.filter_by(venue_id=venue.id).filter(
-            Show.start_time < datetime.now()).all()
-        venue.past_shows_count = len(venue.past_shows)
-
-        venue.upcoming_shows = Show.query.filter_by(
-            venue_id=venue.id).filter(Show.start_time >= datetime.now()).all()
-        venue.upcoming_shows_count = len(venue.upcoming_shows)
+        venue = load_with_shows(Venue, Show.venue_id, venue_id)
 
-        venue.genres = venue.genres.split(',')
         return render_template('pages/show_venue.html', venue=venue)
 
     # Create Venue
@@ -203,7 +1076,7 @@ def VenuesRoutes():
                 phone=request.form.get('phone'),
                 facebook_link=request.form.get('facebook_link'),
                 image_link=request.form.get('image_link'),
-                genres=','.join(request.form.getlist('genres')),
+                genres=request.form.getlist('genres'),
                 website=request.form['website'],
                 seeking_talent=True if request.form['seeking_talent'] == '1' else False,
                 seeking_description=request.form['seeking_description'],
@@ -244,7 +1117,6 @@ def VenuesRoutes():
     @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
     def edit_venue(venue_id):
         venue = Venue.query.get(venue_id)
-        venue.genres = venue.genres.split(',')
         form = VenueForm(obj=venue)
 
         return render_template('forms/edit_venue.html', form=form, venue=venue)
@@ -260,17 +1132,15 @@ def VenuesRoutes():
             venue.phone = request.form.get('phone')
             venue.facebook_link = request.form.get('facebook_link')
             venue.image_link = request.form.get('image_link')
-            venue.genres = ','.join(request.form.getlist('genres'))
+            venue.genres = request.form.getlist('genres')
             venue.website = request.form['website']
             venue.seeking_talent = True if request.form['seeking_talent'] == '1' else False
             venue.seeking_description = request.form['seeking_description']
 
-            db.session.execute('update shows set venue_name=\'' +
-                               venue.name + '\', venue_image_link=\'' + venue.image_link + '\' where venue_id=' + str(venue.id))
-
             flash('Venue has been updated successfully', 'success')
 
             db.session.commit()
+            sync_show_names('venue', venue_id)
             return redirect(url_for('show_venue', venue_id=venue_id))
         except Exception as error:
             flash('An error occured: ' + error.__str__(), 'danger')
@@ -288,45 +1158,32 @@ VenuesRoutes()
 
 def ArtistRoutes():
     @app.route('/artists')
+    @read_only
+    @cached('artists')
     def artists():
-        return render_template('pages/artists.html', artists=Artist.query.all())
+        page = keyset_page(with_genre(Artist.query, Artist, request.args.get('genre')), [Artist.id],
+                           request.args.get('after'), app.config['PAGE_SIZE'])
+        return render_list('pages/artists.html', artists=page, page=page, genre=request.args.get('genre'))
 
     @app.route('/artists/search', methods=['POST'])
+    @read_only
     def search_artists():
-        found = Artist.query.filter(Artist.name.like(
-            '%' + request.form.get('search_term', '') + '%')).all()
+        search_term = request.form.get('search_term', '').strip()
+        found = artist_search_index().search(
+            search_term, app.config['SEARCH_RESULTS_LIMIT'])
         response = {
             "count": len(found),
-            "data": found
+            "data": list(map(lambda row: {"id": row[0], "name": row[1]}, found))
         }
-        return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+        return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
     @app.route('/artists/<int:artist_id>')
+    @read_only
+    @conditional(show_validators(Artist, Show.artist_id, 'artist_id'))
+    @cached('artist:{artist_id}', 'venue-names')
     def show_artist(artist_id):
-        # shows the venue page with the given venue_id
-        # TODO: replace with real venue data from the venues table, using venue_id
-        data1 = {
-            "past_shows": [{
-                "venue_id": 1,
-                "venue_name": "The Musical Hop",
-                "venue_image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
-                "start_time": "2019-05-21T21:30:00.000Z"
-            }],
-            "upcoming_shows": [],
-            "past_shows_count": 1,
-            "upcoming_shows_count": 0,
-        }
+        artist = load_with_shows(Artist, Show.artist_id, artist_id)
 
-        artist = Artist.query.get(artist_id)
-        artist.past_shows = Show.query.filter_by(artist_id=artist.id).filter(
-            Show.start_time < datetime.now()).all()
-        artist.past_shows_count = len(artist.past_shows)
-
-        artist.upcoming_shows = Show.query.filter_by(
-            artist_id=artist.id).filter(Show.start_time >= datetime.now()).all()
-        artist.upcoming_shows_count = len(artist.upcoming_shows)
-
-        artist.genres = artist.genres.split(',')
         return render_template('pages/show_artist.html', artist=artist)
 
     #  Update Artist
@@ -335,7 +1192,6 @@ def ArtistRoutes():
     @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
     def edit_artist(artist_id):
         artist = Artist.query.get(artist_id)
-        artist.genres = artist.genres.split(',')
         form = ArtistForm(obj=artist)
         return render_template('forms/edit_artist.html', form=form, artist=artist)
 
@@ -348,12 +1204,11 @@ def ArtistRoutes():
             artist.state = request.form['state']
             artist.phone = request.form['phone']
             artist.facebook_link = request.form['facebook_link']
-            artist.genres = ','.join(request.form.getlist('genres'))
+            artist.genres = request.form.getlist('genres')
             artist.image_link = request.form['image_link']
 
-            db.session.execute('update shows set artist_name=\'' + artist.name +
-                               '\', artist_image_link=\'' + artist.image_link + '\' where artist_id=' + str(artist.id))
             db.session.commit()
+            sync_show_names('artist', artist_id)
 
             flash('artist updated successfully', 'success')
 
@@ -384,7 +1239,7 @@ def ArtistRoutes():
                 city=request.form['city'],
                 state=request.form['state'],
                 phone=request.form['phone'],
-                genres=','.join(request.form.getlist('genres')),
+                genres=request.form.getlist('genres'),
                 facebook_link=request.form['facebook_link'],
                 image_link=request.form['image_link']
             ))
@@ -424,6 +1279,9 @@ ArtistRoutes()
 def ShowsRoutes():
     # list shows
     @app.route('/shows')
+    @read_only
+    @conditional(shows_validators)
+    @cached('shows')
     def shows():
         # displays list of shows at /shows
         # TODO: replace with real venues data.
@@ -437,8 +1295,9 @@ def ShowsRoutes():
             "start_time": "2019-05-21T21:30:00.000Z"
         }]
 
-        shows = Show.query.all()
-        return render_template('pages/shows.html', shows=shows)
+        page = keyset_page(Show.query.options(*show_load_options(Show.venue, Show.artist)),
+                           [Show.start_time, Show.id], request.args.get('after'), app.config['PAGE_SIZE'])
+        return render_list('pages/shows.html', shows=fill_show_names(page), page=page)
 
     # create show form
 
@@ -447,27 +1306,45 @@ def ShowsRoutes():
         # renders form. do not touch.
         form = ShowForm()
 
-        form.artist_id.choices = list(
-            map(lambda artist: (artist.id, artist.name), Artist.query.all()))
-        form.venue_id.choices = list(
-            map(lambda venue: (venue.id, venue.name), Venue.query.all()))
+        # only (id, name) pairs are needed, so skip building ORM objects
+        form.artist_id.choices = list(map(tuple, db.session.query(
+            Artist.id, Artist.name).order_by(Artist.name)))
+        form.venue_id.choices = list(map(tuple, db.session.query(
+            Venue.id, Venue.name).order_by(Venue.name)))
         return render_template('forms/new_show.html', form=form)
 
     # Store Show
     @app.route('/shows/create', methods=['POST'])
     def create_show_submission():
         try:
-            artist = Artist.query.get(request.form['artist_id'])
-            venue = Venue.query.get(request.form['venue_id'])
-
+            # the row locks queue concurrent bookings for the same venue or
+            # artist, so the conflict check below cannot race another insert
+            artist = Artist.query.with_for_update().get(request.form['artist_id'])
+            venue = Venue.query.with_for_update().get(request.form['venue_id'])
+
+            start_time = dateutil.parser.parse(request.form['start_time'])
+            duration = request.form.get('duration', app.config['SHOW_DEFAULT_MINUTES'], type=int)
+            if not 0 < duration <= app.config['SHOW_MAX_MINUTES']:
+                raise ValueError('a show lasts between 1 and %d minutes' % app.config['SHOW_MAX_MINUTES'])
+            end_time = start_time + timedelta(minutes=duration)
+
+            conflicts = booking_conflicts(start_time, end_time, venue.id, artist.id)
+            if conflicts:
+                db.session.rollback()
+                flash('%s or %s is already booked at %s' % (
+                    venue.name, artist.name, ', '.join(format_datetime(show.start_time) for show in conflicts)), 'danger')
+                return redirect(url_for('create_shows'))
+
+            copy = not names_joined()
             db.session.add(Show(
                 artist_id=request.form['artist_id'],
-                artist_name=artist.name,
-                artist_image_link=artist.image_link,
+                artist_name=artist.name if copy else None,
+                artist_image_link=artist.image_link if copy else None,
                 venue_id=request.form['venue_id'],
-                venue_name=venue.name,
-                venue_image_link=venue.image_link,
-                start_time=request.form['start_time']
+                venue_name=venue.name if copy else None,
+                venue_image_link=venue.image_link if copy else None,
+                start_time=start_time,
+                end_time=end_time
             ))
 
             db.session.commit()
@@ -498,17 +1375,445 @@ def server_error(error):
     return render_template('errors/500.html'), 500
 
 
+if app.config['ACCESS_LOG']:
+    log_requests(app)
+
 if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
+    log_errors(app)
     app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
     app.logger.info('errors')
 
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+
+def form_values(form_class, row):
+    # run a file row through the same form the create pages use
+    formdata = MultiDict()
+    for key, value in row.items():
+        if key == 'genres' and isinstance(value, str):
+            value = [genre.strip() for genre in value.split(',') if genre.strip()]
+        for item in value if isinstance(value, list) else [value]:
+            formdata.add(key, '' if item is None else str(item))
+    form = form_class(formdata=formdata, meta={'csrf': False})
+    if not form.validate():
+        return None, form.errors
+    values = {name: field.data for name, field in form._fields.items() if name != 'submit'}
+    return values, None
+
+
+def show_values(row, venues, artists, venue_ids, artist_ids):
+    # references may be given by id or by exact name
+    try:
+        venue_id = int(row.get('venue_id') or venue_ids.get(row.get('venue_name')) or 0)
+        artist_id = int(row.get('artist_id') or artist_ids.get(row.get('artist_name')) or 0)
+    except ValueError:
+        venue_id = artist_id = None
+    venue = venues.get(venue_id)
+    artist = artists.get(artist_id)
+    if venue is None or artist is None:
+        return None, {'reference': ['unknown venue or artist']}
+    try:
+        start_time = dateutil.parser.parse(row.get('start_time') or '')
+        end_time = dateutil.parser.parse(row['end_time']) if row.get('end_time') else \
+            start_time + timedelta(minutes=app.config['SHOW_DEFAULT_MINUTES'])
+    except (ValueError, OverflowError):
+        return None, {'start_time': ['not a date and time']}
+    if not timedelta(0) < end_time - start_time <= timedelta(minutes=app.config['SHOW_MAX_MINUTES']):
+        return None, {'end_time': ['a show lasts between 1 and %d minutes' % app.config['SHOW_MAX_MINUTES']]}
+    copy = not names_joined()
+    return {
+        'venue_id': venue_id,
+        'venue_name': venue[0] if copy else None,
+        'venue_image_link': venue[1] if copy else None,
+        'artist_id': artist_id,
+        'artist_name': artist[0] if copy else None,
+        'artist_image_link': artist[1] if copy else None,
+        'start_time': start_time,
+        'end_time': end_time,
+    }, None
+
+
+def bookable_shows(chunk):
+    # split (line number, values) rows into those that can be booked and the
+    # line numbers that overlap a stored show, or an earlier row of the file,
+    # at the same venue or with the same artist. the stored shows that can
+    # clash are read once per chunk, over the window booking_conflicts scans.
+    earliest = min(as_utc(values['start_time']) for number, values in chunk) - \
+        timedelta(minutes=app.config['SHOW_MAX_MINUTES'])
+    latest = max(as_utc(values['end_time']) for number, values in chunk)
+    booked = {}
+    stored = db.session.query(Show.venue_id, Show.artist_id, Show.start_time, Show.end_time).filter(
+        db.or_(Show.venue_id.in_({values['venue_id'] for number, values in chunk}),
+               Show.artist_id.in_({values['artist_id'] for number, values in chunk})),
+        Show.start_time > earliest, Show.start_time < latest)
+    for venue_id, artist_id, start_time, end_time in stored:
+        for key in (('venue', venue_id), ('artist', artist_id)):
+            booked.setdefault(key, []).append((as_utc(start_time), as_utc(end_time)))
+
+    accepted, conflicting = [], []
+    for number, values in chunk:
+        start_time, end_time = as_utc(values['start_time']), as_utc(values['end_time'])
+        keys = (('venue', values['venue_id']), ('artist', values['artist_id']))
+        if any(start < end_time and start_time < end for key in keys for start, end in booked.get(key, ())):
+            conflicting.append(number)
+            continue
+        accepted.append(values)
+        for key in keys:
+            booked.setdefault(key, []).append((start_time, end_time))
+    return accepted, conflicting
+
+
+def reserve_ids(model, count):
+    # primary keys for rows inserted with explicit ids, so that rows linking
+    # to them can be written in the same batch without a RETURNING per row.
+    # sqlite has no sequence; the batch's transaction holds the next ids.
+    if db.engine.dialect.name == 'postgresql':
+        return [row[0] for row in db.session.execute(db.text(
+            "SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+            {'table': '"%s"' % model.__tablename__, 'count': count})]
+    start = db.session.query(db.func.coalesce(db.func.max(model.id), 0)).scalar() + 1
+    return list(range(start, start + count))
+
+
+def insert_with_genres(model, chunk, genre_ids):
+    # one executemany INSERT each for the new genres, the venues or artists
+    # and their genre links. genre_ids (name -> id) is loaded once by the
+    # caller and extended here. core inserts skip locate_venues, so venues
+    # are placed from the gazetteer here too.
+    names = [row.pop('genres') for row in chunk]
+    new = sorted({name for row in names for name in row} - set(genre_ids))
+    if new:
+        db.session.execute(Genre.__table__.insert(), [{'name': name} for name in new])
+        genre_ids.update((name, id) for id, name in db.session.query(Genre.id, Genre.name).filter(Genre.name.in_(new)))
+
+    for row, id in zip(chunk, reserve_ids(model, len(chunk))):
+        row['id'] = id
+        if model is Venue:
+            found = gazetteer.locate(row['city'], row['state'])
+            row['latitude'], row['longitude'] = found or (None, None)
+            row['geohash'] = geo.encode(*found) if found else None
+    db.session.execute(model.__table__.insert(), chunk)
+
+    link = genre_links[model]
+    links = [{link.key: row['id'], 'genre_id': genre_ids[name]}
+             for row, row_names in zip(chunk, names) for name in dict.fromkeys(row_names)]
+    if links:
+        db.session.execute(link.table.insert(), links)
+
+
+@app.cli.command('import')
+@click.argument('entity', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path')
+@click.option('--format', type=click.Choice(['csv', 'jsonl']), help='default: guessed from the file name')
+@click.option('--batch-size', default=1000, help='rows per INSERT and transaction')
+def import_command(entity, path, format, batch_size):
+    """Load venues, artists or shows from a CSV or JSONL file."""
+    model = {'venues': Venue, 'artists': Artist, 'shows': Show}[entity]
+
+    if entity == 'shows':
+        venues = {row.id: (row.name, row.image_link) for row in db.session.query(Venue.id, Venue.name, Venue.image_link)}
+        artists = {row.id: (row.name, row.image_link) for row in db.session.query(Artist.id, Artist.name, Artist.image_link)}
+        venue_ids = {name: id for id, (name, image_link) in venues.items()}
+        artist_ids = {name: id for id, (name, image_link) in artists.items()}
+
+        def values(row):
+            return show_values(row, venues, artists, venue_ids, artist_ids)
+    else:
+        form_class = VenueForm if entity == 'venues' else ArtistForm
+
+        def values(row):
+            return form_values(form_class, row)
+
+    def valid_rows():
+        for number, row in read_rows(path, format):
+            value, errors = values(row)
+            if errors:
+                stats['rejected'] += 1
+                click.echo('line %d rejected: %s' % (number, errors), err=True)
+            else:
+                yield number, value
+
+    stats = {'inserted': 0, 'rejected': 0}
+    started = time.perf_counter()
+    genre_ids = {name: id for id, name in db.session.query(Genre.id, Genre.name)}
+    for chunk in chunked(valid_rows(), batch_size):
+        if entity == 'shows':
+            # the same overlap rule as create_show_submission; earlier chunks
+            # are committed, so the stored shows cover them
+            chunk, conflicting = bookable_shows(chunk)
+            for number in conflicting:
+                stats['rejected'] += 1
+                click.echo('line %d rejected: venue or artist already booked' % number, err=True)
+            if chunk:
+                db.session.execute(model.__table__.insert(), chunk)
+        else:
+            chunk = [values for number, values in chunk]
+            insert_with_genres(model, chunk, genre_ids)
+        db.session.commit()
+        stats['inserted'] += len(chunk)
+        click.echo('%d rows inserted, %.0f rows/s' % (stats['inserted'], stats['inserted'] / (time.perf_counter() - started)))
+
+    # core inserts bypass the session hooks
+    if entity == 'shows':
+        refresh_upcoming_counts()
+    index_stamps.clear()
+    cache.bump(['venues', 'artists', 'shows', 'venue-names', 'artist-names'])
+    click.echo('done: %d inserted, %d rejected in %.1fs' % (stats['inserted'], stats['rejected'], time.perf_counter() - started))
+    click.echo('running web workers rebuild their search indexes within %ds' % app.config['SEARCH_INDEX_CHECK_SECONDS'])
+
+
+#----------------------------------------------------------------------------#
+# Bulk export.
+#----------------------------------------------------------------------------#
+
+export_models = {'venues': Venue, 'artists': Artist, 'shows': Show}
+
+
+def export_rows(entity, format, since=None):
+    # rows come from a server-side cursor and leave as text lines, so memory
+    # stays flat whatever the table size
+    model = export_models[entity]
+    columns = [column.name for column in model.__table__.columns]
+    if model is Show and names_joined():
+        query = join_show_parents(db.session.query(*show_columns()))
+    else:
+        query = db.session.query(*model.__table__.columns)
+    if model in genre_links:
+        columns.append('genres')
+        query = query.add_columns(joined_genres(model))
+    if since is not None:
+        query = query.filter(model.updated_at >= since)
+    return encode_rows(query.order_by(model.id).yield_per(1000), columns, format)
+
+
+def parse_since(value):
+    if not value:
+        return None
+    return as_utc(dateutil.parser.parse(value))
+
+
+@app.route('/export/<entity>.<format>')
+def export(entity, format):
+    if entity not in export_models or format not in ('jsonl', 'csv'):
+        abort(404)
+    try:
+        since = parse_since(request.args.get('since'))
+    except (ValueError, OverflowError):
+        abort(400)
+
+    chunks = export_rows(entity, format, since)
+    headers = {'Content-Disposition': 'attachment; filename=%s.%s' % (entity, format)}
+    if 'gzip' in request.accept_encodings:
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    mimetype = 'text/csv' if format == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+
+@app.cli.command('export')
+@click.argument('entity', type=click.Choice(sorted(export_models)))
+@click.argument('output', type=click.File('wb'), default='-')
+@click.option('--format', type=click.Choice(['jsonl', 'csv']), default='jsonl')
+@click.option('--since', help='only rows modified at or after this time (ISO 8601, UTC if no offset)')
+@click.option('--gzip/--no-gzip', 'compress', default=None, help='default: when OUTPUT ends in .gz')
+def export_command(entity, output, format, since, compress):
+    """Write every venue, artist or show to OUTPUT (default stdout)."""
+    chunks = export_rows(entity, format, parse_since(since))
+    if compress or (compress is None and getattr(output, 'name', '').endswith('.gz')):
+        chunks = gzip_chunks(chunks)
+    for chunk in chunks:
+        output.write(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+
+
+#----------------------------------------------------------------------------#
+# Show partitions and archive.
+#----------------------------------------------------------------------------#
+
+# on postgres, migration c7f1a3e9d254 range-partitions shows by month
+# (shows_y2026m10, ...) with a shows_default partition for anything beyond,
+# so upcoming-show queries only touch the recent partitions. months older
+# than SHOW_ARCHIVE_MONTHS go to gzip files and their partitions are
+# dropped; other databases delete the archived rows instead.
+
+
+def month_start(value):
+    return as_utc(value).astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, count=1):
+    months = month.year * 12 + month.month - 1 + count
+    return month.replace(year=months // 12, month=months % 12 + 1)
+
+
+def partition_name(month):
+    return 'shows_' + month.strftime('y%Ym%m')
+
+
+def shows_partitioned():
+    return db.engine.dialect.name == 'postgresql' and db.session.execute(db.text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'shows'::regclass")).first() is not None
+
+
+def partition_exists(name):
+    return db.session.execute(db.text('SELECT to_regclass(:name) IS NOT NULL'), {'name': name}).scalar()
+
+
+def partition_attached(name):
+    return db.session.execute(db.text(
+        "SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(:name) AND inhparent = 'shows'::regclass"),
+        {'name': name}).first() is not None
+
+
+def archive_month(month):
+    # write the month's shows to a file, then drop them from the database.
+    # a partition is detached before it is read, so no show can be added to
+    # it after the export and be dropped unarchived (later inserts for the
+    # month land in shows_default). the file is complete before anything is
+    # deleted.
+    # one file per month; shows added to an archived month afterwards stay
+    # in the database
+    if ShowArchive.query.filter(ShowArchive.month == month.date()).first() is not None:
+        return 0
+    end = add_months(month)
+    name = 'shows-%s.jsonl.gz' % month.strftime('%Y-%m')
+    path = os.path.join(app.config['SHOW_ARCHIVE_DIR'], name)
+    columns = [column.name for column in Show.__table__.columns]
+
+    partition = partition_name(month)
+    detached = shows_partitioned() and partition_exists(partition)
+    if detached:
+        # a run that failed after detaching left the table behind
+        if partition_attached(partition):
+            db.session.execute(db.text('ALTER TABLE shows DETACH PARTITION %s' % partition))
+            db.session.commit()
+        source = db.table(partition, *[db.column(column) for column in columns])
+        rows = db.session.query(*source.c).order_by(source.c.start_time, source.c.id)
+    else:
+        window = db.and_(Show.start_time >= month, Show.start_time < end)
+        rows = db.session.query(*Show.__table__.columns).filter(window).order_by(Show.start_time, Show.id)
+
+    parents = set()
+    ids = []
+
+    def archived():
+        for row in rows.yield_per(1000):
+            parents.update([('venue', row.venue_id), ('artist', row.artist_id)])
+            ids.append(row.id)
+            yield row
+
+    with open(path + '.tmp', 'wb') as output:
+        for chunk in gzip_chunks(encode_rows(archived(), columns, 'jsonl')):
+            output.write(chunk)
+    if detached:
+        db.session.execute(db.text('DROP TABLE %s' % partition))
+    if not ids:
+        os.remove(path + '.tmp')
+        db.session.commit()
+        return 0
+    os.replace(path + '.tmp', path)
+
+    if not detached:
+        # by id, so a show added to the month during the export stays
+        for chunk in chunked(ids, 1000):
+            Show.query.filter(Show.id.in_(chunk)).delete(synchronize_session=False)
+    archive = ShowArchive(month=month.date(), path=name, rows=len(ids))
+    db.session.add(archive)
+    db.session.flush()
+    db.session.execute(show_archive_parents.insert(), [
+        {'kind': kind, 'parent_id': id, 'archive_id': archive.id} for kind, id in parents if id is not None])
+    db.session.commit()
+    cache.bump({'%s:%s' % parent for parent in parents} | {'shows'})
+    return len(ids)
+
+
+@app.cli.command('partition-shows')
+@click.option('--ahead', default=12, help='months of partitions to have ready')
+def partition_shows_command(ahead):
+    """Create the monthly shows partitions for the coming months (run from cron)."""
+    if not shows_partitioned():
+        click.echo('shows is not partitioned; only postgres is, from migration c7f1a3e9d254')
+        return
+    month = month_start(datetime.now(timezone.utc))
+    for i in range(ahead + 1):
+        name, end = partition_name(month), add_months(month)
+        if not partition_exists(name):
+            # rows for the month already in the default partition move over,
+            # since a new partition may not overlap what the default holds
+            bounds = {'start': month, 'end': end}
+            db.session.execute(db.text('CREATE TABLE %s (LIKE shows INCLUDING DEFAULTS)' % name))
+            db.session.execute(db.text('INSERT INTO %s SELECT * FROM shows_default '
+                                       'WHERE start_time >= :start AND start_time < :end' % name), bounds)
+            db.session.execute(db.text('DELETE FROM shows_default WHERE start_time >= :start AND start_time < :end'),
+                               bounds)
+            db.session.execute(db.text("ALTER TABLE shows ATTACH PARTITION %s FOR VALUES FROM ('%s') TO ('%s')" % (
+                name, month.isoformat(), end.isoformat())))
+            db.session.commit()
+            click.echo('created ' + name)
+        month = end
+
+
+@app.cli.command('archive-shows')
+@click.option('--months', default=None, type=int, help='archive months that ended this many months ago (default: SHOW_ARCHIVE_MONTHS)')
+def archive_shows_command(months):
+    """Move old shows to gzip JSONL files in SHOW_ARCHIVE_DIR, one per month."""
+    cutoff = add_months(month_start(datetime.now(timezone.utc)), -(months or app.config['SHOW_ARCHIVE_MONTHS']))
+    first = db.session.query(db.func.min(Show.start_time)).scalar()
+    if first is None:
+        return
+    os.makedirs(app.config['SHOW_ARCHIVE_DIR'], exist_ok=True)
+    month = month_start(first)
+    while month < cutoff:
+        count = archive_month(month)
+        if count:
+            click.echo('%s: %d shows archived' % (month.strftime('%Y-%m'), count))
+        month = add_months(month)
+
+
+def archived_shows(key, id):
+    # past shows moved out by archive-shows, newest first. only the months
+    # holding shows of this venue or artist are opened, one at a time, and
+    # only when someone asks for these pages.
+    names = {}
+    archives = ShowArchive.query.join(show_archive_parents, show_archive_parents.c.archive_id == ShowArchive.id).filter(
+        show_archive_parents.c.kind == key[:-len('_id')], show_archive_parents.c.parent_id == id)
+    for archive in archives.order_by(ShowArchive.month.desc()).all():
+        path = os.path.join(app.config['SHOW_ARCHIVE_DIR'], archive.path)
+        if not os.path.exists(path):
+            continue
+        found = [row for number, row in read_rows(path, 'jsonl') if row[key] == id]
+        for row in reversed(found):
+            row['start_time'] = dateutil.parser.parse(row['start_time'])
+            # joined mode archives no copied names
+            for kind, model in (('venue', Venue), ('artist', Artist)):
+                if row[kind + '_name'] is None:
+                    parent = names.get((kind, row[kind + '_id']))
+                    if parent is None:
+                        parent = names[(kind, row[kind + '_id'])] = db.session.query(
+                            model.name, model.image_link).filter(model.id == row[kind + '_id']).first() or ('', '')
+                    row[kind + '_name'], row[kind + '_image_link'] = parent
+            yield row
+
+
+@app.route('/venues/<int:venue_id>/archived-shows')
+@read_only
+@cached('venue:{venue_id}')
+def archived_venue_shows(venue_id):
+    venue = Venue.query.get_or_404(venue_id)
+    return render_list('pages/archived_shows.html', parent=venue, kind='venue',
+                       shows=archived_shows('venue_id', venue_id))
+
+
+@app.route('/artists/<int:artist_id>/archived-shows')
+@read_only
+@cached('artist:{artist_id}')
+def archived_artist_shows(artist_id):
+    artist = Artist.query.get_or_404(artist_id)
+    return render_list('pages/archived_shows.html', parent=artist, kind='artist',
+                       shows=archived_shows('artist_id', artist_id))
+
+
 #----------------------------------------------------------------------------#
 # Launch.
 #----------------------------------------------------------------------------#
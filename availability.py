@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+
+def merge(intervals):
+    """Sorted, non-overlapping (start, end) pairs covering the same time.
+
+    Touching intervals are joined, so back-to-back shows read as one busy block.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def free_slots(busy, start, end, min_length=timedelta(0)):
+    """The gaps in [start, end) not covered by busy (start, end) pairs.
+
+    Gaps shorter than min_length are left out.
+    """
+    slots = []
+    cursor = start
+    for busy_start, busy_end in merge(busy):
+        if busy_end <= cursor:
+            continue
+        if busy_start >= end:
+            break
+        if busy_start > cursor and busy_start - cursor >= min_length:
+            slots.append((cursor, busy_start))
+        cursor = max(cursor, busy_end)
+    if end > cursor and end - cursor >= min_length:
+        slots.append((cursor, end))
+    return slots
@@ -0,0 +1,75 @@
+"""Time the show lookups with and without the indexes on the shows table.
+
+    python -m benchmarks.bench_show_indexes --shows 1000000
+
+Uses a throwaway sqlite file unless --url points at another database.
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+
+from app import Show
+from benchmarks.seed import seed
+
+queries = {
+    'venue detail': 'select id from shows where venue_id = :venue_id and start_time >= :now',
+    'artist detail': 'select id from shows where artist_id = :artist_id and start_time >= :now',
+    'cascade delete lookup': 'select id from shows where venue_id = :venue_id',
+    'upcoming shows': 'select count(id) from shows where start_time >= :now',
+}
+
+
+def run(connection, repeat, venues, artists):
+    timings = {}
+    for name, sql in queries.items():
+        started = time.perf_counter()
+        for i in range(repeat):
+            connection.execute(text(sql), {'venue_id': i % venues + 1, 'artist_id': i % artists + 1,
+                                           'now': datetime.now()}).fetchall()
+        timings[name] = (time.perf_counter() - started) / repeat * 1000
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--url')
+    parser.add_argument('--venues', type=int, default=20000)
+    parser.add_argument('--artists', type=int, default=50000)
+    parser.add_argument('--shows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    path = None
+    if args.url is None:
+        path = tempfile.mktemp(suffix='.db')
+        args.url = 'sqlite:///' + path
+    engine = create_engine(args.url)
+
+    try:
+        print('seeding %d shows...' % args.shows)
+        seed(engine, args.venues, args.artists, args.shows)
+
+        with engine.connect() as connection:
+            for index in Show.__table__.indexes:
+                index.drop(connection)
+            without = run(connection, args.repeat, args.venues, args.artists)
+            for index in Show.__table__.indexes:
+                index.create(connection)
+            with_indexes = run(connection, args.repeat, args.venues, args.artists)
+
+        print('%-24s %12s %12s %9s' % ('query', 'no index ms', 'indexed ms', 'speedup'))
+        for name in queries:
+            print('%-24s %12.3f %12.3f %8.1fx' % (name, without[name], with_indexes[name],
+                                                   without[name] / max(with_indexes[name], 1e-9)))
+    finally:
+        engine.dispose()
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Compare the denormalised and joined show read modes (SHOW_READ_MODE).
+
+    python -m benchmarks.bench_show_reads --shows 200000
+
+Reports the bytes the copied columns add per show row, the write cost of
+inserting shows and renaming a venue, and the latency of the /shows keyset
+page query and the venue detail query in both modes.
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session, joinedload
+
+from app import Venue, Artist, Show
+from benchmarks.seed import seed
+from pagination import keyset_page
+
+copied = [Show.venue_name, Show.artist_name, Show.venue_image_link, Show.artist_image_link]
+
+
+def timed(repeat, work):
+    started = time.perf_counter()
+    for i in range(repeat):
+        work(i)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--url')
+    parser.add_argument('--venues', type=int, default=2000)
+    parser.add_argument('--artists', type=int, default=5000)
+    parser.add_argument('--shows', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    path = None
+    if args.url is None:
+        path = tempfile.mktemp(suffix='.db')
+        args.url = 'sqlite:///' + path
+    engine = create_engine(args.url)
+
+    try:
+        seed(engine, args.venues, args.artists, args.shows)
+        session = Session(bind=engine)
+        results = {}
+
+        width = session.query(func.avg(sum(func.coalesce(func.length(column), 0) for column in copied))).scalar()
+        results['copied bytes per row'] = (float(width), 0.0)
+
+        def insert(names):
+            def work(i):
+                venue = session.query(Venue).get(i % args.venues + 1)
+                artist = session.query(Artist).get(i % args.artists + 1)
+                session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=datetime.now() + timedelta(days=1),
+                                 venue_name=venue.name if names else None,
+                                 venue_image_link=venue.image_link if names else None,
+                                 artist_name=artist.name if names else None,
+                                 artist_image_link=artist.image_link if names else None))
+                session.commit()
+            return work
+        results['insert show ms'] = (timed(args.repeat, insert(True)), timed(args.repeat, insert(False)))
+
+        def rename(fan_out):
+            def work(i):
+                id = i % args.venues + 1
+                session.query(Venue).filter(Venue.id == id).update({Venue.name: 'Renamed %d' % i})
+                if fan_out:
+                    session.query(Show).filter(Show.venue_id == id).update(
+                        {Show.venue_name: 'Renamed %d' % i}, synchronize_session=False)
+                session.commit()
+            return work
+        results['rename venue ms'] = (timed(args.repeat, rename(True)), timed(args.repeat, rename(False)))
+
+        def shows_page(joined):
+            # walk the pages forward through their "Next" cursors, as /shows does
+            cursor = [None]
+
+            def work(i):
+                query = session.query(Show)
+                if joined:
+                    query = query.options(joinedload(Show.venue), joinedload(Show.artist))
+                page = keyset_page(query, [Show.start_time, Show.id], cursor[0], 50)
+                for show in page:
+                    if joined:
+                        show.venue.name, show.artist.name
+                cursor[0] = page.next_cursor
+                session.expunge_all()
+            return work
+        results['/shows page ms'] = (timed(args.repeat, shows_page(False)), timed(args.repeat, shows_page(True)))
+
+        def venue_detail(joined):
+            def work(i):
+                query = session.query(Show).filter(Show.venue_id == i % args.venues + 1)
+                if joined:
+                    query = query.options(joinedload(Show.artist))
+                for show in query.order_by(Show.start_time):
+                    if joined:
+                        show.artist.name
+                session.expunge_all()
+            return work
+        results['venue detail ms'] = (timed(args.repeat, venue_detail(False)), timed(args.repeat, venue_detail(True)))
+
+        session.close()
+        print('%-24s %14s %10s' % ('', 'denormalised', 'joined'))
+        for name, (denormalised, joined) in results.items():
+            print('%-24s %14.3f %10.3f' % (name, denormalised, joined))
+    finally:
+        engine.dispose()
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+"""Replay a weighted request mix against the app and report latency per route.
+
+    python -m benchmarks.replay --shows 100000 --requests 5000 --concurrency 8
+    python -m benchmarks.replay --url postgresql:///fyyur_bench --server wsgi --compare 1a2b3c4
+
+Seeds a synthetic dataset (benchmarks/seed.py) into --url, a temporary
+SQLite file by default, points the app at it through DATABASE_URL and
+replays requests drawn from benchmarks/mix.jsonl. 'client' drives the
+Flask test client in process, 'wsgi' a threaded werkzeug server over
+HTTP. The request sequence depends only on --seed, so runs are comparable.
+
+Results go to benchmarks/results/<commit>-<server>.json. --compare takes
+a commit (or a results file) and prints the change against it. Set
+CACHE_TYPE or SHOW_READ_MODE in the environment to compare configurations;
+both are recorded with the results.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import quote, urlencode
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_mix(path):
+    with open(path) as lines:
+        return [json.loads(line) for line in lines if line.strip()]
+
+
+def plan(mix, count, venues, artists, seed):
+    """The request sequence: (name, method, path, form data) tuples."""
+    from benchmarks.seed import genres, cities
+    rng = random.Random(seed)
+    weights = [entry.get('weight', 1) for entry in mix]
+    now = datetime.now()
+    requests = []
+    for entry in rng.choices(mix, weights, k=count):
+        values = {
+            'venue': rng.randint(1, venues),
+            'artist': rng.randint(1, artists),
+            'term': '%s %d' % (rng.choice(['Venue', 'Artist']), rng.randint(1, 99)),
+            'start_time': (now + timedelta(days=rng.randint(1, 365))).strftime('%Y-%m-%d %H:%M:%S'),
+            'genre': rng.choice(genres),
+        }
+        values['city'], values['state'] = rng.choice(cities)
+        data = entry.get('data')
+        if data is not None:
+            data = {key: value.format(**values) for key, value in data.items()}
+        path = entry['path'].format(**{key: quote(str(value)) for key, value in values.items()})
+        requests.append((entry['name'], entry['method'], path, data))
+    return requests
+
+
+def percentile(timings, p):
+    # nearest rank on sorted timings
+    return timings[max(0, int(math.ceil(p / 100 * len(timings))) - 1)]
+
+
+def run(requests, concurrency, send):
+    """Send requests from `concurrency` threads; returns (elapsed, timings)."""
+    timings = {}
+    lock = threading.Lock()
+    pending = iter(requests)
+
+    def worker():
+        client = send()
+        while True:
+            with lock:
+                request = next(pending, None)
+            if request is None:
+                return
+            started = time.perf_counter()
+            try:
+                status = client(*request[1:])
+            except (OSError, http.client.HTTPException):
+                status = 0
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                timings.setdefault(request[0], []).append((elapsed, status))
+
+    threads = [threading.Thread(target=worker) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, timings
+
+
+def test_client(app):
+    def send():
+        client = app.test_client()
+
+        def request(method, path, data):
+            response = client.open(path, method=method, data=data)
+            response.get_data()
+            response.close()
+            return response.status_code
+        return request
+    return send
+
+
+def wsgi_client(port):
+    def send():
+        def request(method, path, data):
+            connection = http.client.HTTPConnection('127.0.0.1', port)
+            body = urlencode(data) if data is not None else None
+            headers = {'Content-Type': 'application/x-www-form-urlencoded'} if data is not None else {}
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+            return response.status
+        return request
+    return send
+
+
+def summarise(elapsed, timings):
+    routes = {}
+    for name, samples in sorted(timings.items()):
+        ms = sorted(sample[0] for sample in samples)
+        routes[name] = {
+            'count': len(ms),
+            # connection failures count with 5xx; redirects are expected
+            'errors': sum(1 for sample in samples if not 200 <= sample[1] < 500),
+            'mean': sum(ms) / len(ms),
+            'p50': percentile(ms, 50),
+            'p95': percentile(ms, 95),
+            'p99': percentile(ms, 99),
+        }
+    total = sum(route['count'] for route in routes.values())
+    return {'seconds': elapsed, 'throughput': total / elapsed, 'routes': routes}
+
+
+def commit():
+    try:
+        head = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=here).decode().strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD'], cwd=here)
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return head + ('-dirty' if dirty else '')
+
+
+def report(result, baseline=None):
+    def change(now, before):
+        return ' %+6.1f%%' % ((now - before) / before * 100) if before else ''
+
+    print('%s  %s, %d requests in %.2fs, %.1f req/s%s' % (
+        result['commit'], result['server'], sum(route['count'] for route in result['routes'].values()),
+        result['seconds'], result['throughput'],
+        change(result['throughput'], baseline['throughput']) if baseline else ''))
+    print('%-16s %7s %6s %9s %9s %9s %9s' % ('route', 'count', 'errors', 'mean ms', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for name, route in result['routes'].items():
+        before = (baseline or {}).get('routes', {}).get(name, {})
+        print('%-16s %7d %6d %9.2f %9.2f %9.2f %9.2f%s' % (
+            name, route['count'], route['errors'], route['mean'], route['p50'], route['p95'], route['p99'],
+            (' p50' + change(route['p50'], before['p50']) + ' p95' + change(route['p95'], before['p95']))
+            if before else ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='database to seed and serve from (default: a temporary sqlite file)')
+    parser.add_argument('--no-seed', action='store_true', help='replay against the data already in --url')
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=2000)
+    parser.add_argument('--shows', type=int, default=50000)
+    parser.add_argument('--mix', default=os.path.join(here, 'mix.jsonl'))
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=100, help='requests sent before timing starts')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--server', choices=['client', 'wsgi', 'both'], default='both')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--results', default=os.path.join(here, 'results'))
+    parser.add_argument('--compare', help='commit or results file to compare against')
+    args = parser.parse_args()
+
+    path = None
+    if args.url is None:
+        path = tempfile.mktemp(suffix='.db')
+        args.url = 'sqlite:///' + path
+    # the app reads its configuration on import
+    os.environ['DATABASE_URL'] = args.url
+    os.environ.setdefault('ACCESS_LOG', '')
+    from werkzeug.serving import make_server, WSGIRequestHandler
+    from app import app, db, refresh_upcoming_counts
+    from benchmarks.seed import seed
+
+    # template lookups are not part of the workload
+    app.config['EXPLAIN_TEMPLATE_LOADING'] = False
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args):
+            pass
+
+    try:
+        with app.app_context():
+            if not args.no_seed:
+                seed(db.engine, args.venues, args.artists, args.shows, seed=args.seed)
+                if db.engine.dialect.name == 'postgresql':
+                    # seed() inserts explicit ids, move the sequences past them
+                    for table in ('genres', 'Venue', 'Artist', 'shows'):
+                        db.session.execute("SELECT setval(pg_get_serial_sequence('\"%s\"', 'id'), "
+                                           "(SELECT max(id) FROM \"%s\"))" % (table, table))
+                refresh_upcoming_counts()
+            dialect = db.engine.dialect.name
+
+        mix = load_mix(args.mix)
+        warmup = plan(mix, args.warmup, args.venues, args.artists, args.seed + 1)
+        requests = plan(mix, args.requests, args.venues, args.artists, args.seed)
+        os.makedirs(args.results, exist_ok=True)
+
+        for server in ('client', 'wsgi') if args.server == 'both' else (args.server,):
+            httpd = None
+            if server == 'wsgi':
+                httpd = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+                threading.Thread(target=httpd.serve_forever, daemon=True).start()
+                send = wsgi_client(httpd.server_port)
+            else:
+                send = test_client(app)
+            try:
+                run(warmup, args.concurrency, send)
+                result = summarise(*run(requests, args.concurrency, send))
+            finally:
+                if httpd is not None:
+                    httpd.shutdown()
+
+            # read the baseline before a run of the same commit replaces it
+            baseline = None
+            if args.compare:
+                compare = args.compare
+                if not os.path.exists(compare):
+                    compare = os.path.join(args.results, '%s-%s.json' % (compare, server))
+                with open(compare) as previous:
+                    baseline = json.load(previous)
+
+            result.update({
+                'commit': commit(),
+                'date': datetime.now().isoformat(timespec='seconds'),
+                'server': server,
+                'database': dialect,
+                'venues': args.venues,
+                'artists': args.artists,
+                'shows': args.shows,
+                'concurrency': args.concurrency,
+                'cache': app.config['CACHE_TYPE'],
+                'show_read_mode': app.config['SHOW_READ_MODE'],
+            })
+            with open(os.path.join(args.results, '%s-%s.json' % (result['commit'], server)), 'w') as output:
+                json.dump(result, output, indent=2, sort_keys=True)
+            report(result, baseline)
+    finally:
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import random
+from datetime import datetime, timedelta
+
+import geo
+from app import db, Venue, Artist, Show, Genre, venue_genres, artist_genres, gazetteer
+
+genres = ['Jazz', 'Reggae', 'Swing', 'Classical', 'Folk', 'Rock n Roll', 'Blues', 'Hip-Hop']
+cities = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'), ('Chicago', 'IL'),
+          ('Seattle', 'WA'), ('Boston', 'MA'), ('Denver', 'CO'), ('Nashville', 'TN')]
+
+
+def chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def seed(engine, venues=1000, artists=2000, shows=100000, batch_size=10000, seed=42):
+    """Create the schema on engine and fill it with a deterministic dataset."""
+    rng = random.Random(seed)
+    now = datetime.now()
+    db.metadata.create_all(engine)
+    links = {venue_genres: [], artist_genres: []}
+
+    def genre_links(table, key, id):
+        for genre in rng.sample(genres, 2):
+            links[table].append({key: id, 'genre_id': genres.index(genre) + 1})
+
+    def venue_rows():
+        for id in range(1, venues + 1):
+            city, state = rng.choice(cities)
+            genre_links(venue_genres, 'venue_id', id)
+            # spread around the city centre, up to about 20 km out
+            latitude, longitude = gazetteer.locate(city, state)
+            latitude += rng.uniform(-0.2, 0.2)
+            longitude += rng.uniform(-0.2, 0.2)
+            yield {'id': id, 'name': 'Venue %d' % id, 'city': city, 'state': state,
+                   'address': '%d Main St' % id, 'image_link': 'https://example.com/venues/%d.jpg' % id,
+                   'latitude': latitude, 'longitude': longitude, 'geohash': geo.encode(latitude, longitude)}
+
+    def artist_rows():
+        for id in range(1, artists + 1):
+            city, state = rng.choice(cities)
+            genre_links(artist_genres, 'artist_id', id)
+            yield {'id': id, 'name': 'Artist %d' % id, 'city': city, 'state': state,
+                   'image_link': 'https://example.com/artists/%d.jpg' % id}
+
+    def show_rows():
+        for id in range(1, shows + 1):
+            venue_id = rng.randint(1, venues)
+            artist_id = rng.randint(1, artists)
+            # three quarters of the shows are in the past
+            start_time = now + timedelta(hours=rng.randint(-3 * 365 * 24, 365 * 24))
+            yield {'id': id, 'venue_id': venue_id, 'venue_name': 'Venue %d' % venue_id,
+                   'artist_id': artist_id, 'artist_name': 'Artist %d' % artist_id,
+                   'venue_image_link': 'https://example.com/venues/%d.jpg' % venue_id,
+                   'artist_image_link': 'https://example.com/artists/%d.jpg' % artist_id,
+                   'start_time': start_time,
+                   'end_time': start_time + timedelta(minutes=rng.choice([60, 90, 120, 180]))}
+
+    # the link lists fill as the venue and artist rows are generated
+    for table, rows in ((Genre.__table__, ({'id': id, 'name': name} for id, name in enumerate(genres, 1))),
+                        (Venue.__table__, venue_rows()), (venue_genres, iter(links[venue_genres])),
+                        (Artist.__table__, artist_rows()), (artist_genres, iter(links[artist_genres])),
+                        (Show.__table__, show_rows())):
+        for chunk in chunks(rows, batch_size):
+            with engine.begin() as connection:
+                connection.execute(table.insert(), chunk)
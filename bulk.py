@@ -0,0 +1,74 @@
+import csv
+import gzip
+import io
+import json
+from datetime import date
+import zlib
+
+
+def open_text(path):
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_rows(path, format=None):
+    """Yield (line number, dict) from a CSV or JSONL file, optionally gzipped."""
+    format = format or ('jsonl' if '.jsonl' in path or '.json' in path else 'csv')
+    with open_text(path) as lines:
+        if format == 'csv':
+            reader = csv.DictReader(lines)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for number, line in enumerate(lines, 1):
+                if line.strip():
+                    yield number, json.loads(line)
+
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def plain(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def encode_rows(rows, columns, format):
+    """Yield the rows as CSV or JSONL text, one line per chunk."""
+    if format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow([plain(value) for value in row])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(columns, map(plain, row)))) + '\n'
+
+
+def gzip_chunks(chunks, level=6, flush_bytes=64 * 1024):
+    """Gzip a stream of text chunks, yielding compressed bytes as they fill up."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    pending = 0
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        pending += len(data)
+        out = compressor.compress(data)
+        if pending >= flush_bytes:
+            out += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if out:
+            yield out
+    yield compressor.flush()
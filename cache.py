@@ -0,0 +1,135 @@
+from collections import OrderedDict
+import pickle
+import threading
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class LRUCache(object):
+    """In-process cache with least-recently-used eviction and per-entry TTL.
+
+    Tag versions live outside the LRU so an eviction can never reset one and
+    bring entries cached under an older version back to life.
+    """
+
+    def __init__(self, max_entries=1024, default_ttl=60):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.entries = OrderedDict()
+        self.tag_versions = {}
+        self.tag_bumped = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + (ttl or self.default_ttl), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def versions(self, tags):
+        with self.lock:
+            return [self.tag_versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self.lock:
+            now = time.time()
+            for tag in tags:
+                self.tag_versions[tag] = self.tag_versions.get(tag, 0) + 1
+                self.tag_bumped[tag] = now
+
+    def last_bump(self, tags):
+        """Wall-clock time of the latest bump of any of tags, 0 if never."""
+        with self.lock:
+            return max([self.tag_bumped.get(tag, 0) for tag in tags] or [0])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tag_versions.clear()
+            self.tag_bumped.clear()
+
+
+class RedisCache(object):
+    """Cache shared by every worker through a Redis-compatible server."""
+
+    def __init__(self, url, default_ttl=60, prefix='fyyur:'):
+        if redis is None:
+            raise RuntimeError('CACHE_TYPE = "redis" requires the redis package')
+        self.client = redis.Redis.from_url(url)
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self.client.setex(self.prefix + key, ttl or self.default_ttl, pickle.dumps(value))
+
+    def versions(self, tags):
+        if not tags:
+            return []
+        return [int(version or 0) for version in self.client.mget([self.prefix + 'tag:' + tag for tag in tags])]
+
+    def bump(self, tags):
+        now = time.time()
+        pipeline = self.client.pipeline()
+        for tag in tags:
+            pipeline.incr(self.prefix + 'tag:' + tag)
+            pipeline.set(self.prefix + 'bumped:' + tag, now)
+        pipeline.execute()
+
+    def last_bump(self, tags):
+        if not tags:
+            return 0
+        return max(float(at or 0) for at in self.client.mget([self.prefix + 'bumped:' + tag for tag in tags]))
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class NullCache(object):
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def versions(self, tags):
+        return [0 for tag in tags]
+
+    def bump(self, tags):
+        pass
+
+    def last_bump(self, tags):
+        return 0
+
+    def clear(self):
+        pass
+
+
+def make_cache(config):
+    kind = config.get('CACHE_TYPE', 'lru')
+    if kind == 'redis':
+        return RedisCache(config['CACHE_REDIS_URL'], config.get('CACHE_DEFAULT_TTL', 60))
+    if kind == 'lru':
+        return LRUCache(config.get('CACHE_MAX_ENTRIES', 1024), config.get('CACHE_DEFAULT_TTL', 60))
+    return NullCache()
@@ -7,10 +7,101 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 DEBUG = True
 
 # Connect to the database
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql:///fyyur')
 
+# Connection pool, per worker process. Size gunicorn so that
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays below max_connections.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+# seconds to wait for a free connection before failing the request
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+# seconds after which a connection is replaced, below server/proxy idle limits
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+# milliseconds before postgres cancels a statement run for a request, 0 for
+# no limit. cli commands (import, export, archiving, recounts) have none.
+DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 5000))
 
-# TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgresql:///fyyur'
+# Read replicas for the read-only pages, comma separated
+SQLALCHEMY_REPLICA_URIS = [uri for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri]
+# after a write, keep that client on the primary this many seconds so it
+# reads its own changes despite replication lag
+REPLICA_STICKY_SECONDS = 5
+
+SQLALCHEMY_ENGINE_OPTIONS = {}
+if not SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
 
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 EXPLAIN_TEMPLATE_LOADING = True
+
+# Maximum number of rows returned by the venue/artist search routes
+SEARCH_RESULTS_LIMIT = 50
+# Seconds between checks that a worker's in-memory artist/venue name indexes
+# still match the database (other workers and imports write too)
+SEARCH_INDEX_CHECK_SECONDS = 30
+
+# City-centre coordinates used to place venues (city,state,latitude,longitude)
+GAZETTEER_PATH = os.path.join(basedir, 'data', 'gazetteer.csv')
+# /venues/nearby radius in km when none is given, the largest allowed, and
+# the most venues it returns
+NEARBY_DEFAULT_KM = 50
+NEARBY_MAX_KM = 500
+NEARBY_MAX_RESULTS = 50
+
+# Show length in minutes when none is given, and the longest allowed. Booking
+# conflict checks scan back SHOW_MAX_MINUTES from a new show's end.
+SHOW_DEFAULT_MINUTES = 120
+SHOW_MAX_MINUTES = 12 * 60
+# Longest date range /venues/<id>/availability answers
+AVAILABILITY_MAX_DAYS = 92
+
+# Shows from months that ended this long ago are moved to gzip JSONL files
+# in SHOW_ARCHIVE_DIR by `flask archive-shows`
+SHOW_ARCHIVE_MONTHS = 24
+SHOW_ARCHIVE_DIR = os.environ.get('SHOW_ARCHIVE_DIR', os.path.join(basedir, 'archive'))
+
+# Rows per page on the venue, artist and show listings
+PAGE_SIZE = 50
+
+# Largest ?limit= on the /api/v1 lists (api.py), and the smallest response
+# body it compresses
+API_MAX_PAGE_SIZE = 200
+API_COMPRESS_MIN_BYTES = 1024
+
+# Stream the venue, artist and show listings while rows are read
+STREAM_TEMPLATES = True
+
+# Response cache for the read routes: 'lru' (per process), 'redis' (shared,
+# needs the redis package) or 'null' (disabled)
+CACHE_TYPE = os.environ.get('CACHE_TYPE', 'lru')
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+CACHE_DEFAULT_TTL = 60
+CACHE_MAX_ENTRIES = 1024
+
+# Copy edited venue/artist names into their shows on a background thread,
+# this many rows per transaction
+DENORM_SYNC_ASYNC = True
+DENORM_SYNC_CHUNK_SIZE = 1000
+
+# Where show pages get venue/artist names and images: 'denormalised' (copies
+# stored on each show) or 'joined' (eager-loaded from the venue and artist)
+SHOW_READ_MODE = os.environ.get('SHOW_READ_MODE', 'denormalised')
+
+# Log a possible N+1 when one statement shape runs this many times in a request
+SQL_N_PLUS_ONE_THRESHOLD = 5
+# In debug mode, list each page's SQL in a panel at the bottom of the page
+SQL_DEBUG_TOOLBAR = False
+
+# JSON access log (one line per request, empty to disable) and error log,
+# both rotated by size
+ACCESS_LOG = os.environ.get('ACCESS_LOG', os.path.join(basedir, 'access.log'))
+ERROR_LOG = os.path.join(basedir, 'error.log')
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
@@ -6,9 +6,7 @@ from fabric.contrib.console import confirm
 
 def test():
     with settings(warn_only=True):
-        result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
-        )
+        result = local("python -m pytest -q tests", capture=True)
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
@@ -27,6 +25,15 @@ def prepare():
     commit()
     push()
 
+# benchmark
+
+
+def bench(compare=None):
+    command = "python -m benchmarks.replay"
+    if compare:
+        command += " --compare " + compare
+    local(command)
+
 # deploy to heroku
 
 
@@ -39,9 +46,7 @@ def heroku():
 
 
 def heroku_test():
-    local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
-    )
+    local("heroku run python -m pytest -q tests")
 
 
 def deploy():
@@ -1,8 +1,9 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, TextAreaField
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, TextAreaField, IntegerField
 from wtforms.fields.simple import SubmitField
-from wtforms.validators import DataRequired, AnyOf, URL, ValidationError
+from wtforms.validators import DataRequired, AnyOf, URL, ValidationError, NumberRange
+from config import SHOW_DEFAULT_MINUTES, SHOW_MAX_MINUTES
 
 availableGenres = [
     ('Alternative', 'Alternative'),
@@ -51,6 +52,11 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default=datetime.today()
     )
+    duration = IntegerField(
+        'duration',
+        validators=[DataRequired(), NumberRange(min=1, max=SHOW_MAX_MINUTES)],
+        default=SHOW_DEFAULT_MINUTES
+    )
 
     submit = SubmitField('submit')
 
@@ -0,0 +1,91 @@
+import csv
+import math
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+base32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode(latitude, longitude, precision=9):
+    """Geohash of a point: nearby points share a prefix, so a cell is one
+    range scan over an ordinary string index."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    code, bits, value, even = [], 0, 0, True
+    while len(code) < precision:
+        # bits alternate between longitude and latitude, longitude first
+        target, point = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (target[0] + target[1]) / 2
+        value <<= 1
+        if point >= middle:
+            value |= 1
+            target[0] = middle
+        else:
+            target[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            code.append(base32[value])
+            bits, value = 0, 0
+    return ''.join(code)
+
+
+def cell_size(precision):
+    """(latitude, longitude) degrees covered by one cell."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def covering_cells(latitude, longitude, km):
+    """Geohash prefixes whose cells together contain every point within km.
+
+    Picks the longest prefix whose cell is at least km across, then takes
+    the cell holding the point and its eight neighbours.
+    """
+    shrink = max(math.cos(math.radians(latitude)), 0.01)
+    precision = 1
+    while precision < 9:
+        lat_size, lon_size = cell_size(precision + 1)
+        if lat_size * KM_PER_DEGREE < km or lon_size * KM_PER_DEGREE * shrink < km:
+            break
+        precision += 1
+    lat_size, lon_size = cell_size(precision)
+    cells = set()
+    for lat_step in (-1, 0, 1):
+        for lon_step in (-1, 0, 1):
+            lat = min(max(latitude + lat_step * lat_size, -90.0), 90.0)
+            lon = (longitude + lon_step * lon_size + 180.0) % 360.0 - 180.0
+            cells.add(encode(lat, lon, precision))
+    return sorted(cells)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class Gazetteer(object):
+    """City centre coordinates read from a CSV of city,state,latitude,longitude."""
+
+    def __init__(self, path):
+        self.path = path
+        self.places = None
+
+    def load(self):
+        places = {}
+        with open(self.path, newline='', encoding='utf-8') as rows:
+            for row in csv.DictReader(rows):
+                places[self.key(row['city'], row['state'])] = (float(row['latitude']), float(row['longitude']))
+        self.places = places
+
+    @staticmethod
+    def key(city, state):
+        return ' '.join((city or '').lower().split()), (state or '').strip().upper()
+
+    def locate(self, city, state):
+        """(latitude, longitude) of the city, or None if it is not listed."""
+        if self.places is None:
+            self.load()
+        return self.places.get(self.key(city, state))
@@ -0,0 +1,99 @@
+from collections import Counter
+import re
+import time
+
+from flask import g, has_app_context, request
+from markupsafe import escape
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+in_lists = re.compile(r'\bIN \((?:[^()]|\([^()]*\))*\)', re.IGNORECASE)
+spaces = re.compile(r'\s+')
+
+
+def fingerprint(statement):
+    """Reduce a statement to its shape so repeats with new values collide."""
+    statement = literals.sub('?', statement)
+    statement = in_lists.sub('IN (...)', statement)
+    return spaces.sub(' ', statement).strip()
+
+
+class QueryStats(object):
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def repeated(self, threshold):
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_timer(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    stats = g.get('sql') if has_app_context() else None
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += elapsed
+        stats.statements[fingerprint(statement)] += 1
+
+
+@event.listens_for(Engine, 'handle_error')
+def drop_timer(context):
+    # a failed statement never reaches after_cursor_execute; without this its
+    # start time would stay on the pooled connection
+    started = context.connection.info.get('query_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+toolbar = """<div id="sql-toolbar" style="position:fixed;bottom:0;right:0;z-index:9999;max-width:60%%;max-height:40%%;
+overflow:auto;background:#222;color:#eee;font:12px monospace;padding:6px;opacity:.9">
+<strong>%d queries, %.1f ms</strong><ol>%s</ol></div>"""
+
+
+def instrument(app):
+    """Count the SQL each request runs and report it.
+
+    - Server-Timing header: db time and query count (for streamed pages, only
+      what ran before the first byte)
+    - a warning in the log when one statement shape repeats
+      SQL_N_PLUS_ONE_THRESHOLD times in a request, the mark of an N+1
+    - with SQL_DEBUG_TOOLBAR in debug mode, a panel listing the statements at
+      the bottom of every HTML page
+    """
+
+    @app.before_request
+    def start_query_stats():
+        g.sql = QueryStats()
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.get('sql')
+        if stats is None:
+            return response
+        response.headers.add('Server-Timing', 'db;dur=%.2f;desc="%d queries"' % (stats.seconds * 1000, stats.count))
+
+        if app.debug and app.config.get('SQL_DEBUG_TOOLBAR') and not response.is_streamed \
+                and response.mimetype == 'text/html':
+            items = ''.join('<li>%d&times; %s</li>' % (count, escape(statement))
+                            for statement, count in stats.statements.most_common())
+            body = response.get_data(as_text=True)
+            panel = toolbar % (stats.count, stats.seconds * 1000, items)
+            response.set_data(body.replace('</body>', panel + '</body>', 1))
+        return response
+
+    @app.teardown_request
+    def flag_n_plus_one(error):
+        # teardown runs after streamed pages have finished, so every query counts
+        stats = g.get('sql')
+        if stats is None:
+            return
+        for statement, count in stats.repeated(app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 5)):
+            app.logger.warning('possible N+1 on %s: %d x %s', request.path, count, statement)
@@ -0,0 +1,60 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection.
+
+    Counters live on the pool, so they restart when the engine is disposed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self.lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self.lock:
+                self.checkouts += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': self.size(),
+                'checked_out': self.checkedout(),
+                'checked_in': self.checkedin(),
+                'overflow': max(self.overflow(), 0),
+                'checkouts_total': self.checkouts,
+                'timeouts_total': self.timeouts,
+                'wait_seconds_total': self.wait_seconds,
+                'wait_seconds_max': self.max_wait_seconds,
+            }
+
+
+def prometheus_text(pools):
+    """Render {label: pool} in the Prometheus text exposition format."""
+    lines = []
+    samples = [(label, pool.stats()) for label, pool in pools.items() if isinstance(pool, InstrumentedQueuePool)]
+    for name in samples[0][1] if samples else []:
+        kind = 'counter' if name.endswith('_total') else 'gauge'
+        lines.append('# TYPE fyyur_db_pool_%s %s' % (name, kind))
+        for label, stats in samples:
+            lines.append('fyyur_db_pool_%s{pool="%s"} %s' % (name, label, stats[name]))
+    return '\n'.join(lines) + '\n'
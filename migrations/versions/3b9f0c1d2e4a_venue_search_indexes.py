@@ -0,0 +1,36 @@
+"""venue search trigram indexes
+
+Revision ID: 3b9f0c1d2e4a
+Revises: a160e8cceb97
+Create Date: 2026-10-18 09:12:04.511320
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9f0c1d2e4a'
+down_revision = 'a160e8cceb97'
+branch_labels = None
+depends_on = None
+
+columns = ['name', 'city', 'state', 'genres']
+
+
+def upgrade():
+    # trigram indexes let postgres answer ILIKE '%term%' without a full scan.
+    # other databases (sqlite in development) keep scanning.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in columns:
+        op.create_index('ix_venue_' + column + '_trgm', 'Venue', [column],
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for column in columns:
+        op.drop_index('ix_venue_' + column + '_trgm', table_name='Venue')
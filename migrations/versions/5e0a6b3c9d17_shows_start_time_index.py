@@ -0,0 +1,27 @@
+"""shows start_time index
+
+Revision ID: 5e0a6b3c9d17
+Revises: c41d8e7f2a63
+Create Date: 2026-10-18 12:05:12.660931
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e0a6b3c9d17'
+down_revision = 'c41d8e7f2a63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # venue_id and artist_id lookups (including cascade deletes) are served by
+    # the leading column of the (venue_id, start_time) and
+    # (artist_id, start_time) indexes; this covers the upcoming-show filters.
+    op.create_index('ix_shows_start_time', 'shows', ['start_time'])
+
+
+def downgrade():
+    op.drop_index('ix_shows_start_time', table_name='shows')
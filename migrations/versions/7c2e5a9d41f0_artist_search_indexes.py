@@ -0,0 +1,32 @@
+"""artist search indexes
+
+Revision ID: 7c2e5a9d41f0
+Revises: 3b9f0c1d2e4a
+Create Date: 2026-10-18 10:02:47.118205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e5a9d41f0'
+down_revision = '3b9f0c1d2e4a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # case-insensitive equality and prefix lookups on lower(name)
+    op.create_index('ix_artist_name_lower', 'Artist', [sa.text('lower(name)')])
+    # substring (ILIKE '%term%') lookups, postgres only
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index('ix_artist_name_trgm', 'Artist', ['name'],
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_artist_name_trgm', table_name='Artist')
+    op.drop_index('ix_artist_name_lower', table_name='Artist')
@@ -0,0 +1,37 @@
+"""upcoming shows counters
+
+Revision ID: 9a4f7d2b6c81
+Revises: 5e0a6b3c9d17
+Create Date: 2026-10-18 13:41:55.208374
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4f7d2b6c81'
+down_revision = '5e0a6b3c9d17'
+branch_labels = None
+depends_on = None
+
+shows = sa.table('shows', sa.column('id'), sa.column('venue_id'),
+                 sa.column('artist_id'), sa.column('start_time'))
+
+
+def upgrade():
+    now = datetime.now()
+    for table, foreign_key in (('Venue', shows.c.venue_id), ('Artist', shows.c.artist_id)):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(),
+                                       nullable=False, server_default='0'))
+        parent = sa.table(table, sa.column('id'), sa.column('upcoming_shows_count'))
+        count = sa.select([sa.func.count(shows.c.id)]).where(
+            sa.and_(foreign_key == parent.c.id, shows.c.start_time >= now)).as_scalar()
+        op.execute(parent.update().values(upcoming_shows_count=count))
+
+
+def downgrade():
+    op.drop_column('Artist', 'upcoming_shows_count')
+    op.drop_column('Venue', 'upcoming_shows_count')
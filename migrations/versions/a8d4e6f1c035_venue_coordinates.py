@@ -0,0 +1,31 @@
+"""venue coordinates and geohash index
+
+Revision ID: a8d4e6f1c035
+Revises: f3a9c2d7b410
+Create Date: 2026-10-18 21:27:48.930512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d4e6f1c035'
+down_revision = 'f3a9c2d7b410'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # filled in by `flask geocode-venues`
+    op.add_column('Venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('geohash', sa.String(length=12), nullable=True))
+    op.create_index('ix_venue_geohash', 'Venue', ['geohash'])
+
+
+def downgrade():
+    op.drop_index('ix_venue_geohash', table_name='Venue')
+    op.drop_column('Venue', 'geohash')
+    op.drop_column('Venue', 'longitude')
+    op.drop_column('Venue', 'latitude')
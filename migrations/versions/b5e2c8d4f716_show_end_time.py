@@ -0,0 +1,31 @@
+"""show end time
+
+Revision ID: b5e2c8d4f716
+Revises: a8d4e6f1c035
+Create Date: 2026-10-18 23:41:05.118342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e2c8d4f716'
+down_revision = 'a8d4e6f1c035'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('shows', sa.Column('end_time', sa.DateTime(timezone=True), nullable=True))
+    # existing shows get the default length of two hours
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("UPDATE shows SET end_time = start_time + interval '120 minutes'")
+    else:
+        op.execute("UPDATE shows SET end_time = datetime(start_time, '+120 minutes')")
+    with op.batch_alter_table('shows') as batch:
+        batch.alter_column('end_time', existing_type=sa.DateTime(timezone=True), nullable=False)
+
+
+def downgrade():
+    op.drop_column('shows', 'end_time')
@@ -0,0 +1,92 @@
+"""partition shows by month, show archive manifest
+
+Revision ID: c7f1a3e9d254
+Revises: b5e2c8d4f716
+Create Date: 2026-10-19 01:12:36.507219
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7f1a3e9d254'
+down_revision = 'b5e2c8d4f716'
+branch_labels = None
+depends_on = None
+
+indexes = [
+    ('ix_shows_venue_id_start_time', 'venue_id, start_time'),
+    ('ix_shows_artist_id_start_time', 'artist_id, start_time'),
+    ('ix_shows_start_time', 'start_time'),
+    ('ix_shows_updated_at', 'updated_at'),
+]
+
+
+def add_month(month, count=1):
+    months = month.year * 12 + month.month - 1 + count
+    return month.replace(year=months // 12, month=months % 12 + 1)
+
+
+def upgrade():
+    op.create_table('show_archives',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('month', sa.Date(), nullable=False),
+                    sa.Column('path', sa.String(length=500), nullable=False),
+                    sa.Column('rows', sa.Integer(), nullable=False),
+                    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+                    sa.PrimaryKeyConstraint('id'),
+                    sa.UniqueConstraint('month'))
+
+    # range partitions need postgres; elsewhere `flask archive-shows`
+    # deletes archived rows instead of dropping partitions
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    # a partitioned table's primary key must contain the partition key. the
+    # id sequence is detached first so dropping the old table keeps it.
+    op.execute('ALTER SEQUENCE shows_id_seq OWNED BY NONE')
+    op.execute('CREATE TABLE shows_partitioned (LIKE shows INCLUDING DEFAULTS) PARTITION BY RANGE (start_time)')
+    op.execute('ALTER TABLE shows_partitioned ADD PRIMARY KEY (id, start_time)')
+
+    # one partition per month from the first show to a year ahead; anything
+    # later lands in the default partition until `flask partition-shows`
+    # splits it out
+    first = bind.execute(sa.text('SELECT min(start_time) FROM shows')).scalar()
+    now = datetime.now(timezone.utc)
+    month = (first or now).astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = add_month(now.replace(day=1, hour=0, minute=0, second=0, microsecond=0), 12)
+    while month < end:
+        op.execute("CREATE TABLE shows_%s PARTITION OF shows_partitioned FOR VALUES FROM ('%s') TO ('%s')" % (
+            month.strftime('y%Ym%m'), month.isoformat(), add_month(month).isoformat()))
+        month = add_month(month)
+    op.execute('CREATE TABLE shows_default PARTITION OF shows_partitioned DEFAULT')
+
+    op.execute('INSERT INTO shows_partitioned SELECT * FROM shows')
+    op.execute('DROP TABLE shows')
+    op.execute('ALTER TABLE shows_partitioned RENAME TO shows')
+    op.execute('ALTER SEQUENCE shows_id_seq OWNED BY shows.id')
+    for name, columns in indexes:
+        op.execute('CREATE INDEX %s ON shows (%s)' % (name, columns))
+    op.create_foreign_key('shows_venue_id_fkey', 'shows', 'Venue', ['venue_id'], ['id'])
+    op.create_foreign_key('shows_artist_id_fkey', 'shows', 'Artist', ['artist_id'], ['id'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('ALTER SEQUENCE shows_id_seq OWNED BY NONE')
+        op.execute('CREATE TABLE shows_plain (LIKE shows INCLUDING DEFAULTS)')
+        op.execute('INSERT INTO shows_plain SELECT * FROM shows')
+        op.execute('DROP TABLE shows CASCADE')
+        op.execute('ALTER TABLE shows_plain RENAME TO shows')
+        op.execute('ALTER TABLE shows ADD PRIMARY KEY (id)')
+        op.execute('ALTER SEQUENCE shows_id_seq OWNED BY shows.id')
+        for name, columns in indexes:
+            op.execute('CREATE INDEX %s ON shows (%s)' % (name, columns))
+        op.create_foreign_key('shows_venue_id_fkey', 'shows', 'Venue', ['venue_id'], ['id'])
+        op.create_foreign_key('shows_artist_id_fkey', 'shows', 'Artist', ['artist_id'], ['id'])
+    op.drop_table('show_archives')
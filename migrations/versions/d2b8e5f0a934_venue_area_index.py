@@ -0,0 +1,25 @@
+"""venue area index
+
+Revision ID: d2b8e5f0a934
+Revises: 9a4f7d2b6c81
+Create Date: 2026-10-18 14:27:09.735112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b8e5f0a934'
+down_revision = '9a4f7d2b6c81'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # serves the ordered, keyset-paginated /venues listing
+    op.create_index('ix_venue_state_city', 'Venue', ['state', 'city', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_venue_state_city', table_name='Venue')
@@ -0,0 +1,52 @@
+"""venues and artists in each show archive
+
+Revision ID: d4a7b9e2c513
+Revises: c7f1a3e9d254
+Create Date: 2026-10-19 09:27:14.602381
+
+"""
+import gzip
+import json
+import os
+
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a7b9e2c513'
+down_revision = 'c7f1a3e9d254'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    parents = op.create_table('show_archive_parents',
+                              sa.Column('kind', sa.String(length=10), nullable=False),
+                              sa.Column('parent_id', sa.Integer(), nullable=False),
+                              sa.Column('archive_id', sa.Integer(), nullable=False),
+                              sa.ForeignKeyConstraint(['archive_id'], ['show_archives.id'], ondelete='CASCADE'),
+                              sa.PrimaryKeyConstraint('kind', 'parent_id', 'archive_id'))
+
+    # index the archives written so far from their files
+    bind = op.get_bind()
+    directory = current_app.config['SHOW_ARCHIVE_DIR']
+    for id, path in bind.execute(sa.text('SELECT id, path FROM show_archives')).fetchall():
+        path = os.path.join(directory, path)
+        if not os.path.exists(path):
+            continue
+        found = set()
+        with gzip.open(path, 'rt', encoding='utf-8') as lines:
+            for line in lines:
+                if line.strip():
+                    row = json.loads(line)
+                    found.update([('venue', row['venue_id']), ('artist', row['artist_id'])])
+        rows = [{'kind': kind, 'parent_id': parent_id, 'archive_id': id}
+                for kind, parent_id in found if parent_id is not None]
+        if rows:
+            op.bulk_insert(parents, rows)
+
+
+def downgrade():
+    op.drop_table('show_archive_parents')
@@ -0,0 +1,39 @@
+"""updated_at version columns
+
+Revision ID: e7c3a1f5b208
+Revises: d2b8e5f0a934
+Create Date: 2026-10-18 15:52:40.381196
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c3a1f5b208'
+down_revision = 'd2b8e5f0a934'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # sqlite cannot add a column with a non-constant default, so the column
+    # is added nullable, filled, then made NOT NULL with its default (batch
+    # mode rebuilds the table on sqlite)
+    for table in ('Venue', 'Artist', 'shows'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+        op.execute('UPDATE "%s" SET updated_at = CURRENT_TIMESTAMP' % table)
+        with op.batch_alter_table(table) as batch:
+            batch.alter_column('updated_at', existing_type=sa.DateTime(timezone=True), nullable=False,
+                               server_default=sa.text('CURRENT_TIMESTAMP'))
+    # the sqlite rebuild only copies indexes on plain columns; bring back the
+    # lower(name) index from 7c2e5a9d41f0
+    if op.get_bind().dialect.name == 'sqlite':
+        op.create_index('ix_artist_name_lower', 'Artist', [sa.text('lower(name)')])
+    op.create_index('ix_shows_updated_at', 'shows', ['updated_at'])
+
+
+def downgrade():
+    op.drop_index('ix_shows_updated_at', table_name='shows')
+    for table in ('shows', 'Artist', 'Venue'):
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,81 @@
+"""genre lookup and association tables
+
+Revision ID: f3a9c2d7b410
+Revises: e7c3a1f5b208
+Create Date: 2026-10-18 19:03:11.204815
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9c2d7b410'
+down_revision = 'e7c3a1f5b208'
+branch_labels = None
+depends_on = None
+
+parents = [('Venue', 'venue_genres', 'venue_id', 1000), ('Artist', 'artist_genres', 'artist_id', 120)]
+
+genres = sa.table('genres', sa.column('id', sa.Integer), sa.column('name', sa.String))
+
+
+def link_table(name, key):
+    return sa.table(name, sa.column(key, sa.Integer), sa.column('genre_id', sa.Integer))
+
+
+def upgrade():
+    op.create_table('genres',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('name', sa.String(length=120), nullable=False),
+                    sa.PrimaryKeyConstraint('id'),
+                    sa.UniqueConstraint('name'))
+    for parent, name, key, length in parents:
+        op.create_table(name,
+                        sa.Column(key, sa.Integer(), nullable=False),
+                        sa.Column('genre_id', sa.Integer(), nullable=False),
+                        sa.ForeignKeyConstraint([key], [parent + '.id'], ondelete='CASCADE'),
+                        sa.ForeignKeyConstraint(['genre_id'], ['genres.id']),
+                        sa.PrimaryKeyConstraint(key, 'genre_id'))
+        op.create_index('ix_%s_genre_id' % name, name, ['genre_id', key])
+
+    # move the comma-joined strings into the new tables
+    bind = op.get_bind()
+    split = {}
+    for parent, name, key, length in parents:
+        rows = bind.execute(sa.text('SELECT id, genres FROM "%s"' % parent))
+        split[parent] = [(id, list(dict.fromkeys(genre.strip() for genre in (joined or '').split(',') if genre.strip())))
+                         for id, joined in rows]
+    names = sorted({genre for rows in split.values() for id, found in rows for genre in found})
+    if names:
+        op.bulk_insert(genres, [{'name': genre} for genre in names])
+    ids = dict(bind.execute(sa.select([genres.c.name, genres.c.id])).fetchall())
+    for parent, name, key, length in parents:
+        links = [{key: id, 'genre_id': ids[genre]} for id, found in split[parent] for genre in found]
+        if links:
+            op.bulk_insert(link_table(name, key), links)
+
+    # dropping the column also drops its trigram index from 3b9f0c1d2e4a
+    for parent, name, key, length in parents:
+        op.drop_column(parent, 'genres')
+
+
+def downgrade():
+    bind = op.get_bind()
+    for parent, name, key, length in parents:
+        op.add_column(parent, sa.Column('genres', sa.String(length), nullable=True))
+        links = link_table(name, key)
+        joined = {}
+        for id, genre in bind.execute(sa.select([links.c[key], genres.c.name]).where(
+                links.c.genre_id == genres.c.id).order_by(links.c[key], genres.c.name)):
+            joined.setdefault(id, []).append(genre)
+        for id, found in joined.items():
+            bind.execute(sa.text('UPDATE "%s" SET genres = :genres WHERE id = :id' % parent),
+                         {'genres': ','.join(found), 'id': id})
+        op.drop_index('ix_%s_genre_id' % name, table_name=name)
+        op.drop_table(name)
+    op.drop_table('genres')
+
+    if bind.dialect.name == 'postgresql':
+        op.create_index('ix_venue_genres_trgm', 'Venue', ['genres'],
+                        postgresql_using='gin', postgresql_ops={'genres': 'gin_trgm_ops'})
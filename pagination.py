@@ -0,0 +1,81 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import DateTime, tuple_
+
+
+class Page(object):
+    """One page of rows, read lazily from the database.
+
+    Iterate it once; next_cursor is known after the last row has been read,
+    which is when templates render their "Next" link.
+    """
+
+    def __init__(self, rows, columns, per_page):
+        self.rows = rows
+        self.columns = columns
+        self.per_page = per_page
+        self.next_cursor = None
+
+    def __iter__(self):
+        last = None
+        for count, row in enumerate(self.rows):
+            if count == self.per_page:
+                # the extra row only proves there is a next page
+                self.next_cursor = encode_cursor([getattr(last, column.key) for column in self.columns])
+                break
+            last = row
+            yield row
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    # a malformed cursor just restarts from the first page
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if len(values) != len(columns):
+            return None
+        return [datetime.fromisoformat(value) if isinstance(column.type, DateTime) else value
+                for column, value in zip(columns, values)]
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_page(query, columns, cursor=None, per_page=50):
+    """Seek to the rows after cursor in the order given by columns.
+
+    The last column must be unique (normally the primary key) so that the
+    order, and therefore every cursor, is stable. Unlike OFFSET, the cost of
+    a page does not grow with its position.
+    """
+    values = decode_cursor(cursor, columns) if cursor else None
+    if values is not None:
+        query = query.filter(tuple_(*columns) > tuple_(*values))
+    # yield_per streams rows from a server-side cursor where the driver
+    # supports it instead of fetching the whole page up front
+    rows = query.order_by(*columns).limit(per_page + 1).yield_per(100)
+    return Page(rows, columns, per_page)
+
+
+def keyset_select(statement, columns, cursor=None, per_page=50):
+    """keyset_page for a Core select, for callers that fetch rows themselves
+    (the async API). Returns the statement for one page plus one look-ahead
+    row; hand the fetched rows to split_page.
+    """
+    values = decode_cursor(cursor, columns) if cursor else None
+    if values is not None:
+        statement = statement.where(tuple_(*columns) > tuple_(*values))
+    return statement.order_by(*columns).limit(per_page + 1)
+
+
+def split_page(rows, columns, per_page):
+    """(the page's rows, cursor of the next page or None)."""
+    if len(rows) <= per_page:
+        return rows, None
+    rows = rows[:per_page]
+    return rows, encode_cursor([getattr(rows[-1], column.key) for column in columns])
@@ -0,0 +1,132 @@
+import atexit
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import queue
+import time
+
+from flask import g, request
+from flask.signals import before_render_template, template_rendered
+
+try:
+    import blinker
+except ImportError:
+    blinker = None
+
+access_logger = logging.getLogger('fyyur.access')
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def queued(handler):
+    """Put handler behind a queue drained by its own thread.
+
+    Request threads only enqueue the record; formatting and file writes
+    (including rotation) happen on the listener thread.
+    """
+    records = queue.Queue(-1)
+    listener = QueueListener(records, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return QueueHandler(records)
+
+
+def rotating(path, config, formatter):
+    handler = RotatingFileHandler(path, maxBytes=config['LOG_MAX_BYTES'],
+                                  backupCount=config['LOG_BACKUP_COUNT'], delay=True)
+    handler.setFormatter(formatter)
+    return handler
+
+
+def timed_render(g_, chunks):
+    # streamed templates render while the response is sent
+    iterator = iter(chunks)
+    while True:
+        started = time.perf_counter()
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            g_.render_seconds = g_.get('render_seconds', 0) + time.perf_counter() - started
+        yield chunk
+
+
+def log_requests(app):
+    """Write one JSON line per request to ACCESS_LOG.
+
+    Fields: method, path, route, status, total_ms, db_ms, queries,
+    render_ms and bytes. Streamed responses are logged when the last byte
+    has been sent, so their times and size are complete.
+    """
+    access_logger.setLevel(logging.INFO)
+    access_logger.propagate = False
+    access_logger.addHandler(queued(rotating(app.config['ACCESS_LOG'], app.config, JsonFormatter())))
+
+    def start_render(sender, template, context, **extra):
+        g.render_started = time.perf_counter()
+
+    def stop_render(sender, template, context, **extra):
+        if 'render_started' in g:
+            g.render_seconds = g.get('render_seconds', 0) + time.perf_counter() - g.pop('render_started')
+
+    # render_template reports through signals, which need blinker
+    if blinker is not None:
+        before_render_template.connect(start_render, app, weak=False)
+        template_rendered.connect(stop_render, app, weak=False)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        request_g = g._get_current_object()
+        started = g.get('request_started', time.perf_counter())
+        fields = {
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'route': request.url_rule.rule if request.url_rule else None,
+            'status': response.status_code,
+        }
+        sent = {'bytes': 0}
+
+        if response.is_streamed:
+            def counted(chunks):
+                for chunk in chunks:
+                    sent['bytes'] += len(chunk) if isinstance(chunk, bytes) else len(chunk.encode('utf-8'))
+                    yield chunk
+            response.response = counted(response.response)
+        else:
+            sent['bytes'] = response.calculate_content_length() or 0
+
+        def write():
+            stats = request_g.get('sql')
+            fields.update({
+                'total_ms': round((time.perf_counter() - started) * 1000, 2),
+                'db_ms': round(stats.seconds * 1000, 2) if stats else 0,
+                'queries': stats.count if stats else 0,
+                'render_ms': round(request_g.get('render_seconds', 0) * 1000, 2),
+                'bytes': sent['bytes'],
+            })
+            access_logger.info('%s %s %s', fields['method'], fields['path'], fields['status'],
+                               extra={'fields': fields})
+
+        response.call_on_close(write)
+        return response
+
+
+def log_errors(app):
+    app.logger.addHandler(queued(rotating(app.config['ERROR_LOG'], app.config, logging.Formatter(
+        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))))
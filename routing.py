@@ -0,0 +1,39 @@
+import random
+
+from flask import g, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, orm
+
+
+def replica_engines(app):
+    """Engines for SQLALCHEMY_REPLICA_URIS, created once per process."""
+    engines = app.extensions.get('replica_engines')
+    if engines is None:
+        engines = app.extensions['replica_engines'] = [
+            create_engine(uri, **app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+            for uri in app.config['SQLALCHEMY_REPLICA_URIS']
+        ]
+    return engines
+
+
+class RoutingSession(SignallingSession):
+    """Session that reads from a replica while a read-only view runs.
+
+    Views opt in by setting g.use_replica. Flushes, and everything outside
+    such a view, go to the primary. One replica is picked per request so all
+    of a page's queries see the same snapshot.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if not self._flushing and has_request_context() and g.get('use_replica'):
+            if 'replica' not in g:
+                engines = replica_engines(self.app)
+                g.replica = random.choice(engines) if engines else None
+            if g.replica is not None:
+                return g.replica
+        return super().get_bind(mapper, clause, **kwargs)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
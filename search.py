@@ -0,0 +1,193 @@
+from collections import defaultdict
+import threading
+
+
+class NGramIndex(object):
+    """In-process, case-insensitive substring index over (id, name) pairs.
+
+    Every lowercased name is split into overlapping n-grams. A lookup
+    intersects the posting sets of the term's n-grams and confirms the
+    candidates with a plain substring test, so it never scans all names
+    unless the term is shorter than n.
+    """
+
+    def __init__(self, n=3):
+        self.n = n
+        self.names = {}
+        self.postings = defaultdict(set)
+        self.loaded = False
+        self.lock = threading.RLock()
+
+    def grams(self, text):
+        return {text[i:i + self.n] for i in range(len(text) - self.n + 1)}
+
+    def load(self, rows):
+        with self.lock:
+            self.names = {}
+            self.postings = defaultdict(set)
+            for key, name in rows:
+                self.add(key, name)
+            self.loaded = True
+
+    def add(self, key, name):
+        with self.lock:
+            self.remove(key)
+            lowered = (name or '').lower()
+            self.names[key] = (lowered, name)
+            for gram in self.grams(lowered):
+                self.postings[gram].add(key)
+
+    def remove(self, key):
+        with self.lock:
+            entry = self.names.pop(key, None)
+            if entry is None:
+                return
+            for gram in self.grams(entry[0]):
+                keys = self.postings.get(gram)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.postings[gram]
+
+    def search(self, term, limit=None):
+        """Return [(id, name)] containing term, best matches first."""
+        term = term.lower()
+        with self.lock:
+            grams = self.grams(term)
+            if grams:
+                postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+                candidates = set(postings[0]).intersection(*postings[1:])
+            else:
+                candidates = self.names.keys()
+
+            matches = []
+            for key in candidates:
+                lowered, name = self.names[key]
+                if term in lowered:
+                    rank = 0 if lowered == term else 1 if lowered.startswith(term) else 2
+                    matches.append((rank, lowered, key, name))
+
+        matches.sort()
+        return [(key, name) for rank, lowered, key, name in matches[:limit]]
+
+
+class RadixTrie(object):
+    """Compressed prefix tree for typeahead over (key, name) pairs.
+
+    Each name is inserted once per word so that "hop" suggests
+    "The Musical Hop". Edges carry whole label strings rather than single
+    characters, which keeps the tree shallow for long names.
+    """
+
+    class Node(object):
+        __slots__ = ('edges', 'keys')
+
+        def __init__(self):
+            # first character -> [label, child]
+            self.edges = {}
+            self.keys = set()
+
+    def __init__(self):
+        self.root = self.Node()
+        self.names = {}
+        self.loaded = False
+        self.lock = threading.RLock()
+
+    def suffixes(self, lowered):
+        starts = [0] + [i + 1 for i, char in enumerate(lowered) if char == ' ']
+        return {lowered[start:] for start in starts if start < len(lowered)}
+
+    def load(self, rows):
+        with self.lock:
+            self.root = self.Node()
+            self.names = {}
+            for key, name in rows:
+                self.add(key, name)
+            self.loaded = True
+
+    def add(self, key, name):
+        with self.lock:
+            self.remove(key)
+            lowered = (name or '').lower()
+            self.names[key] = (lowered, name)
+            for word in self.suffixes(lowered):
+                self.insert(word, key)
+
+    def remove(self, key):
+        with self.lock:
+            entry = self.names.pop(key, None)
+            if entry is None:
+                return
+            for word in self.suffixes(entry[0]):
+                self.delete(word, key)
+
+    def insert(self, word, key):
+        node = self.root
+        while word:
+            edge = node.edges.get(word[0])
+            if edge is None:
+                child = self.Node()
+                node.edges[word[0]] = [word, child]
+                node = child
+                break
+            label, child = edge
+            common = 0
+            while common < len(label) and common < len(word) and label[common] == word[common]:
+                common += 1
+            if common < len(label):
+                # split the edge at the first mismatch
+                middle = self.Node()
+                middle.edges[label[common]] = [label[common:], child]
+                edge[0], edge[1] = label[:common], middle
+                child = middle
+            node = child
+            word = word[common:]
+        node.keys.add(key)
+
+    def delete(self, word, key):
+        path = []
+        node = self.root
+        while word:
+            edge = node.edges.get(word[0])
+            if edge is None or not word.startswith(edge[0]):
+                return
+            path.append((node, word[0]))
+            node = edge[1]
+            word = word[len(edge[0]):]
+        node.keys.discard(key)
+        # prune branches left without keys
+        for parent, first in reversed(path):
+            child = parent.edges[first][1]
+            if child.keys or child.edges:
+                break
+            del parent.edges[first]
+
+    def suggest(self, prefix, limit=10):
+        """Return up to limit [(key, name)] having a word starting with prefix."""
+        prefix = prefix.lower()
+        with self.lock:
+            node = self.root
+            while prefix:
+                edge = node.edges.get(prefix[0])
+                if edge is None:
+                    return []
+                label, child = edge
+                if prefix.startswith(label):
+                    prefix = prefix[len(label):]
+                elif label.startswith(prefix):
+                    prefix = ''
+                else:
+                    return []
+                node = child
+
+            found = []
+            stack = [node]
+            while stack and len(found) < limit:
+                node = stack.pop()
+                for key in sorted(node.keys, key=lambda key: self.names[key][0]):
+                    if key not in found:
+                        found.append(key)
+                for first in sorted(node.edges, reverse=True):
+                    stack.append(node.edges[first][1])
+
+            return [(key, self.names[key][1]) for key in found[:limit]]
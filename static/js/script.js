@@ -2,3 +2,29 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// typeahead for the navbar search boxes, fed by /api/suggest
+document.querySelectorAll('input[data-suggest]').forEach(function (input) {
+  var list = document.getElementById(input.getAttribute('list'));
+  var pending = null;
+  input.addEventListener('input', function () {
+    var q = input.value.trim();
+    clearTimeout(pending);
+    if (!q) {
+      list.innerHTML = '';
+      return;
+    }
+    pending = setTimeout(function () {
+      fetch('/api/suggest?type=' + input.dataset.suggest + '&q=' + encodeURIComponent(q))
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          list.innerHTML = '';
+          data.suggestions.forEach(function (suggestion) {
+            var option = document.createElement('option');
+            option.value = suggestion.name;
+            list.appendChild(option);
+          });
+        });
+    }, 100);
+  });
+});
@@ -0,0 +1,45 @@
+import queue
+import threading
+
+
+class BackgroundQueue(object):
+    """Runs jobs one at a time on a daemon thread, inside an app context.
+
+    Jobs are identified by a key; enqueueing a key that is already waiting is
+    a no-op, so a burst of edits to one venue results in a single job. Jobs
+    must be idempotent: a queue is lost when its process exits.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.jobs = queue.Queue()
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def enqueue(self, key, job, *args):
+        with self.lock:
+            if key in self.pending:
+                return
+            self.pending.add(key)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='background-queue', daemon=True)
+                self.thread.start()
+        self.jobs.put((key, job, args))
+
+    def run(self):
+        while True:
+            key, job, args = self.jobs.get()
+            with self.lock:
+                self.pending.discard(key)
+            try:
+                with self.app.app_context():
+                    job(*args)
+            except Exception:
+                self.app.logger.exception('background job %r failed', key)
+            finally:
+                self.jobs.task_done()
+
+    def join(self):
+        """Block until every queued job has run."""
+        self.jobs.join()
@@ -0,0 +1,5 @@
+import os
+
+# the app reads its configuration on import
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('ACCESS_LOG', '')
@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta, timezone
+
+from availability import free_slots, merge
+
+
+def at(hour, minute=0):
+    return datetime(2030, 1, 1, hour, minute, tzinfo=timezone.utc)
+
+
+def test_merge_joins_overlapping_and_touching():
+    assert merge([(at(20), at(22)), (at(12), at(14)), (at(13), at(15)), (at(15), at(16))]) == [
+        (at(12), at(16)), (at(20), at(22))]
+
+
+def test_free_slots_between_shows():
+    busy = [(at(12), at(14)), (at(18), at(20))]
+    assert free_slots(busy, at(10), at(22)) == [(at(10), at(12)), (at(14), at(18)), (at(20), at(22))]
+
+
+def test_free_slots_clips_shows_reaching_outside_the_range():
+    busy = [(at(8), at(11)), (at(21), at(23))]
+    assert free_slots(busy, at(10), at(22)) == [(at(11), at(21))]
+
+
+def test_free_slots_without_shows():
+    assert free_slots([], at(10), at(22)) == [(at(10), at(22))]
+
+
+def test_free_slots_fully_booked():
+    assert free_slots([(at(9), at(23))], at(10), at(22)) == []
+
+
+def test_free_slots_minimum_length():
+    busy = [(at(12), at(14)), (at(14, 30), at(16))]
+    assert free_slots(busy, at(12), at(18), timedelta(hours=1)) == [(at(16), at(18))]
+    assert free_slots(busy, at(12), at(18), timedelta(minutes=30)) == [(at(14), at(14, 30)), (at(16), at(18))]
+
+
+def test_back_to_back_shows_leave_no_gap():
+    busy = [(at(12), at(14)), (at(14), at(16))]
+    assert free_slots(busy, at(12), at(16)) == []
@@ -0,0 +1,53 @@
+import math
+import random
+
+import pytest
+
+import geo
+
+
+@pytest.fixture(scope='module')
+def venues():
+    from app import app, db, Venue
+    from benchmarks.seed import seed
+    with app.app_context():
+        seed(db.engine, venues=2000, artists=10, shows=0)
+        yield db.session.query(Venue.id, Venue.latitude, Venue.longitude).all()
+        db.drop_all()
+
+
+def test_matches_brute_force(venues):
+    from app import app, nearby_venues
+    rng = random.Random(7)
+    with app.app_context():
+        for i in range(200):
+            latitude, longitude = rng.uniform(25, 48), rng.uniform(-123, -70)
+            km = rng.choice([5, 20, 50, 150, 500])
+            exact = sorted((geo.haversine_km(latitude, longitude, lat, lon), id) for id, lat, lon in venues)
+            expected = [id for distance, id in exact if distance <= km][:10]
+            found = nearby_venues(latitude, longitude, km, 10)
+            assert [row.id for row, distance in found] == expected, (latitude, longitude, km)
+            assert all(distance <= km for row, distance in found)
+
+
+def test_covering_cells_contain_the_radius():
+    rng = random.Random(3)
+    for i in range(200):
+        latitude, longitude = rng.uniform(-60, 60), rng.uniform(-179, 179)
+        km = rng.choice([1, 10, 100, 500])
+        cells = geo.covering_cells(latitude, longitude, km)
+        # points on the circle all fall in one of the cells
+        for step in range(16):
+            bearing = step * 22.5
+            north = km * 0.999 / geo.KM_PER_DEGREE * math.cos(math.radians(bearing))
+            east = km * 0.999 / (geo.KM_PER_DEGREE * math.cos(math.radians(latitude))) * math.sin(math.radians(bearing))
+            code = geo.encode(latitude + north, (longitude + east + 180) % 360 - 180)
+            assert any(code.startswith(cell) for cell in cells), (latitude, longitude, km, bearing)
+
+
+def test_rejects_non_finite_radius(venues):
+    from app import app
+    client = app.test_client()
+    for km in ('nan', 'inf', '-inf'):
+        assert client.get('/venues/nearby?lat=37.7&lon=-122.4&km=' + km).status_code == 400
+    assert client.get('/venues/nearby?lat=37.7&lon=-122.4&km=20').status_code == 200
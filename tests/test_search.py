@@ -0,0 +1,80 @@
+from search import NGramIndex, RadixTrie
+
+
+def test_ngram_search():
+    index = NGramIndex()
+    index.load([(1, 'Guns N Petals'), (2, 'Matt Quevedo'), (3, 'Petal')])
+    assert index.search('petal') == [(3, 'Petal'), (1, 'Guns N Petals')]
+    assert index.search('zz') == []
+    index.remove(3)
+    assert index.search('petal') == [(1, 'Guns N Petals')]
+
+
+def edges(node):
+    return {label: child for label, child in node.edges.values()}
+
+
+def test_insert_splits_shared_prefix():
+    trie = RadixTrie()
+    trie.insert('jazz', 1)
+    assert list(edges(trie.root)) == ['jazz']
+
+    trie.insert('jam', 2)
+    middle = edges(trie.root)['ja']
+    assert sorted(edges(middle)) == ['m', 'zz']
+    assert edges(middle)['zz'].keys == {1}
+    assert edges(middle)['m'].keys == {2}
+
+
+def test_insert_prefix_of_existing_label():
+    trie = RadixTrie()
+    trie.insert('rocker', 1)
+    trie.insert('rock', 2)
+    rock = edges(trie.root)['rock']
+    assert rock.keys == {2}
+    assert edges(rock)['er'].keys == {1}
+
+
+def test_delete_prunes_empty_branches():
+    trie = RadixTrie()
+    trie.insert('jazz', 1)
+    trie.insert('jam', 2)
+    trie.delete('jam', 2)
+    middle = edges(trie.root)['ja']
+    assert list(edges(middle)) == ['zz']
+
+    trie.delete('jazz', 1)
+    assert trie.root.edges == {}
+
+
+def test_delete_keeps_nodes_with_other_keys():
+    trie = RadixTrie()
+    trie.insert('rock', 1)
+    trie.insert('rock', 2)
+    trie.insert('rocker', 3)
+    trie.delete('rock', 1)
+    rock = edges(trie.root)['rock']
+    assert rock.keys == {2}
+    trie.delete('missing', 2)
+    trie.delete('ro', 2)
+    assert rock.keys == {2}
+
+
+def test_suggest_matches_any_word():
+    trie = RadixTrie()
+    trie.load([(1, 'The Musical Hop'), (2, 'Park Square Live Music & Coffee'), (3, 'Guns N Petals')])
+    assert trie.suggest('mus') == [(2, 'Park Square Live Music & Coffee'), (1, 'The Musical Hop')]
+    assert trie.suggest('HOP') == [(1, 'The Musical Hop')]
+    assert trie.suggest('x') == []
+    assert len(trie.suggest('', limit=2)) == 2
+
+
+def test_add_replaces_and_remove_forgets():
+    trie = RadixTrie()
+    trie.add(1, 'Old Name')
+    trie.add(1, 'New Name')
+    assert trie.suggest('old') == []
+    assert trie.suggest('new') == [(1, 'New Name')]
+    trie.remove(1)
+    assert trie.suggest('n') == []
+    assert trie.root.edges == {}